@@ -10,44 +10,69 @@ __maintainer__ = "Dennis Juhasz"
 __email__ = "drjuhasz@wpi.edu"
 __status__ = "Production"
 
+import functools
 import sys
 import random
+from collections import OrderedDict
+
 import numpy as np
 
 from search import GraphProblem, Node, exp_schedule, greedy_best_first_graph_search, astar_search, \
-    depth_first_graph_search, breadth_first_graph_search, UndirectedGraph
-from utils import argmin_random_tie, probability, distance
+    depth_first_graph_search, breadth_first_graph_search, UndirectedGraph, portfolio_search, \
+    HeuristicCache, GridIndex, benchmark_searchers, dstar_lite_search
+from utils import argmin_random_tie, probability, distance, print_table
+
+
+class EuclideanDistances:
+    """ The Euclidean distances between the nodes of a graph, from their coordinates
+    in graph.locations; distances(a, b) is the distance from a to b. With up to
+    dense_limit nodes the whole matrix is computed at once with NumPy; beyond that,
+    the column of distances to a node is computed when first needed, and only the
+    max_columns most recently used are kept. A problem mostly reads the column of its
+    goal, so the dense matrix only pays off for small graphs """
+
+    def __init__(self, locations, dense_limit=256, max_columns=8):
+        self.index = {name: i for i, name in enumerate(locations)}
+        self.coordinates = np.array(list(locations.values()), dtype=float)
+        self.max_columns = max_columns
+        self.columns = OrderedDict()
+        self.matrix = None
+        if len(self.index) <= dense_limit:
+            x, y = self.coordinates[:, 0], self.coordinates[:, 1]
+            self.matrix = np.hypot(np.subtract.outer(x, x), np.subtract.outer(y, y))
+
+    def column(self, b):
+        """ The array of distances from every node to b """
+        j = self.index[b]
+        if self.matrix is not None:
+            return self.matrix[:, j]
+        column = self.columns.get(b)
+        if column is None:
+            delta = self.coordinates - self.coordinates[j]
+            column = self.columns[b] = np.hypot(delta[:, 0], delta[:, 1])
+            if len(self.columns) > self.max_columns:
+                self.columns.popitem(last=False)
+        else:
+            self.columns.move_to_end(b)
+        return column
+
+    def __call__(self, a, b):
+        return self.column(b)[self.index[a]]
 
 
 class LocalGraphProblem(GraphProblem):
-    distances = {}
 
     def __init__(self, initial, goal, graph):
         """ Inherit all functions from GraphProblem (which itself inherits Problem) """
         super().__init__(initial, goal, graph)
-        self.calc_euclidean_distance()
+        # Each problem has its own distances, computed for its graph
+        self.distances = EuclideanDistances(self.graph.locations)
 
     def value(self, state):
         """ Overrides Problem's value() function.
         Used for Hill Climb and Simulated Annealing Search
         Value of a state is the Euclidean distance between the state and the goal """
-        return self.distances[state][self.goal]
-
-    def calc_euclidean_distance(self):
-        # copied / modified from aima-python/gui/tsp.py::main()
-        all_cities = []
-        for city in self.graph.locations.keys():
-            self.distances[city] = {}
-            all_cities.append(city)
-        all_cities.sort()
-
-        # distances['city1']['city2'] contains Euclidean distance between their coordinates
-        for name_1, coordinates_1 in self.graph.locations.items():
-            for name_2, coordinates_2 in self.graph.locations.items():
-                self.distances[name_1][name_2] = np.linalg.norm(
-                    [coordinates_1[0] - coordinates_2[0], coordinates_1[1] - coordinates_2[1]])
-                self.distances[name_2][name_1] = np.linalg.norm(
-                    [coordinates_1[0] - coordinates_2[0], coordinates_1[1] - coordinates_2[1]])
+        return self.distances(state, self.goal)
 
 
 class ProblemSolvingAgent:
@@ -55,29 +80,33 @@ class ProblemSolvingAgent:
 
     def __init__(self, initial, goal, graph):
         self.problem = LocalGraphProblem(initial, goal, graph)
+        # Shared by every search the solvers run on the problem
+        self.heuristic_cache = HeuristicCache().attach(self.problem)
 
-    def hill_climbing_search(self):
+    def hill_climbing_search(self, problem=None):
         """
         From the initial node, keep choosing the neighbor with the lowest value,
         stopping when no neighbor is better. We've then either arrived at the goal state
          (ie found the "peak"), or failed to find the solution (ie found a "ridge").
 
         This returns all the states encountered in reaching the goal state.
+        The problem defaults to the agent's own.
         """
-        current = Node(self.problem.initial)
+        problem = problem or self.problem
+        current = Node(problem.initial)
         while True:
-            neighbors = current.expand(self.problem)
+            neighbors = current.expand(problem)
             if not neighbors:
                 break
-            neighbor = argmin_random_tie(neighbors, key=lambda node: self.problem.value(node.state))
-            if self.problem.value(neighbor.state) > self.problem.value(current.state):
+            neighbor = argmin_random_tie(neighbors, key=lambda node: problem.value(node.state))
+            if problem.value(neighbor.state) > problem.value(current.state):
                 break
 
             current = neighbor
-            if self.problem.goal_test(current.state):
+            if problem.goal_test(current.state):
                 return current
 
-    def simulated_annealing_search(self, schedule=exp_schedule()):
+    def simulated_annealing_search(self, schedule=exp_schedule(), problem=None):
         """
         Instead of picking the best move (like hill_climbing_search), pick a random
         move. If the move improves the situation, it is accepted.
@@ -85,23 +114,26 @@ class ProblemSolvingAgent:
         probability less than 1.
 
         This returns all the states encountered in reaching the goal state.
+        The problem defaults to the agent's own.
         """
+        problem = problem or self.problem
         states = []
-        current = Node(self.problem.initial)
+        current = Node(problem.initial)
         for t in range(sys.maxsize):
             states.append(current.state)
             T = schedule(t)
             if T == 0:
                 return current
-            neighbors = current.expand(self.problem)
+            neighbors = current.expand(problem)
             if not neighbors:
                 return current
             next_choice = random.choice(neighbors)
-            delta_e = self.problem.value(current.state) - self.problem.value(next_choice.state)
+            delta_e = problem.value(current.state) - problem.value(next_choice.state)
             if delta_e > 0 or probability(np.exp(delta_e / T)):
                 current = next_choice
 
-            # The above implementation waits for T exhaustion, the below would instead test for the goal state
+            # The above implementation waits for T exhaustion,
+            # the below would instead test for the goal state
             # if problem.goal_test(current.state):
             #    return current
 
@@ -134,12 +166,11 @@ class ProblemSolvingAgent:
         print("A* Search")
         display(self.problem.initial, result)
 
-        # TODO: implement D* search
-        #result = dstar_search(
-        #    self.problem,
-        #    self.problem.h)
+        # D* Lite search, which can replan incrementally when edge lengths change
+        result = dstar_lite_search(
+            self.problem)
         print("D* Search")
-        #display(self.problem.initial, result)
+        display(self.problem.initial, result)
 
         # Hill climbing search
         result = self.hill_climbing_search()
@@ -151,6 +182,58 @@ class ProblemSolvingAgent:
         print("Simulated Annealing Search")
         display(self.problem.initial, result)
 
+    def portfolio_solver(self, cost_bound=None, timeout=None):
+        """ Races the complete solvers in parallel processes and displays the first
+        solution found (with a cost of at most cost_bound, if given) """
+        winner, result = portfolio_search(self.problem, cost_bound=cost_bound, timeout=timeout)
+        print("Portfolio Search (won by %s)" % winner)
+        if result:
+            display(self.problem.initial, result)
+        else:
+            print("No solution found\n")
+        return winner, result
+
+    def solvers(self):
+        """ The solvers run by parallel_solver: picklable functions of the problem to solve,
+        each named for the report """
+        return [named_solver("Depth First Search", depth_first_graph_search),
+                named_solver("Breadth First Search", breadth_first_graph_search),
+                named_solver("Greedy Best-First Search", greedy_best_first_search),
+                named_solver("A* Search", astar_search),
+                named_solver("D* Search", dstar_lite_search),
+                named_solver("Hill Climbing Search", ProblemSolvingAgent.hill_climbing_search,
+                             self),
+                named_solver("Simulated Annealing Search", simulated_annealing_solver, self)]
+
+    def parallel_solver(self, timeout=60):
+        """ Runs the solvers at the same time, each in its own process, and prints one table
+        comparing their paths, costs, expansions, wall-clock times and peak memory. Returns
+        the report: a dict per solver, as from search.benchmark_searchers """
+        report = benchmark_searchers([self.problem], self.solvers(), timeout=timeout)
+        print_table([[row['searcher'], row['status'], row['cost'], row['expansions'],
+                      None if row['wall'] is None else round(row['wall'] * 1000, 2), row['peak_kb'],
+                      ' → '.join(map(str, row['path'] or []))] for row in report],
+                    ['Algorithm', 'Status', 'Cost', 'Expansions', 'ms', 'Peak KB', 'Path'])
+        print()
+        return report
+
+
+def named_solver(name, function, *args):
+    """ A picklable partial of function with the given leading args, labelled name in reports """
+    solver = functools.partial(function, *args)
+    solver.name = name
+    return solver
+
+
+def greedy_best_first_search(problem):
+    """ Greedy best-first search, with f(n) = h(n) for the problem's own h """
+    return greedy_best_first_graph_search(problem, problem.h)
+
+
+def simulated_annealing_solver(agent, problem):
+    """ The agent's simulated annealing search, with the default schedule, on problem """
+    return agent.simulated_annealing_search(problem=problem)
+
 
 def display(initial, result):
     """ Displays an algorithm result to console """
@@ -177,17 +260,15 @@ def CustomGraph(nodes=list(range(100)), min_links=4, width=400, height=300):
             y_coord += 1
             x_coord = 0
     # Build path from each node to at least min_links nearest neighbors.
+    index = GridIndex(g.locations, nodes)
     for i in range(min_links):
         for node in nodes:
-            if len(g.get(node)) < min_links:
+            links = g.get(node)
+            if len(links) < min_links:
                 here = g.locations[node]
-
-                def distance_to_node(n):
-                    if n is node or g.get(node, n):
-                        return np.inf
-                    return distance(g.locations[n], here)
-
-                neighbor = min(nodes, key=distance_to_node)
+                neighbor = index.nearest(here, lambda n: n is node or links.get(n))
+                if neighbor is None:
+                    continue
                 d = distance(g.locations[neighbor], here)
                 if d == 1.0:
                     g.connect(node, neighbor, int(d))
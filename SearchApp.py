@@ -28,8 +28,8 @@ def main():
         # create the Agent object
         psa = ProblemSolvingAgent(rg.nodes()[0], rg.nodes()[99], rg)
 
-        # call the solver for all algorithms
-        psa.solver()
+        # call the solver for all algorithms, in parallel
+        psa.parallel_solver()
 
         # Prompt the user if they'd like to continue
         #finished = prompt_for_continue()
@@ -6,7 +6,21 @@ then create problem instances and solve them with calls to the various search
 functions.
 """
 
+import collections
+import copy
+import csv
+import heapq
+import itertools
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
 import sys
+import time
+import tracemalloc
+import zlib
+from array import array
 from collections import deque
 
 from utils import *
@@ -73,7 +87,10 @@ class Node:
     the total path_cost (also known as g) to reach the node. Other functions
     may add an f and h value; see best_first_graph_search and astar_search for
     an explanation of how the f and h values are handled. You will not need to
-    subclass this class."""
+    subclass this class. Nodes use __slots__ to keep them small, with the f
+    and h slots reserved for the values cached by memoize."""
+
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'f', 'h')
 
     def __init__(self, state, parent=None, action=None, path_cost=0):
         """Create a search tree Node, derived from a parent by an action."""
@@ -99,7 +116,8 @@ class Node:
     def child_node(self, problem, action):
         """[Figure 3.10]"""
         next_state = problem.result(self.state, action)
-        next_node = Node(next_state, self, action, problem.path_cost(self.path_cost, self.state, action, next_state))
+        next_node = Node(next_state, self, action,
+                         problem.path_cost(self.path_cost, self.state, action, next_state))
         return next_node
 
     def solution(self):
@@ -120,7 +138,7 @@ class Node:
     # want in other contexts.]
 
     def __eq__(self, other):
-        return isinstance(other, Node) and self.state == other.state
+        return isinstance(other, (Node, ArenaNode)) and self.state == other.state
 
     def __hash__(self):
         # We use the hash value of the state
@@ -130,6 +148,267 @@ class Node:
         return hash(self.state)
 
 
+class NodeArena:
+    """Compact storage for the nodes of a large search. Instead of keeping a
+    Node object alive for every node ever generated, the arena appends each
+    node's state, parent index, path cost, depth and action code to flat
+    lists and typed arrays, and hands out small ArenaNode handles. Handles
+    that leave the frontier can be garbage collected, since the search tree
+    survives in the arrays; full Node objects are only built by path().
+    Actions must be hashable; they are interned in a table. Path costs are
+    kept as 64-bit integers while they are all integers, so they come back
+    exactly as computed, and as doubles from the first one that is not.
+    An arena cannot be combined with a SearchEvents sink.
+    Attach an arena to a problem and every searcher will use it:
+        arena = NodeArena().attach(problem)
+        astar_search(problem)
+        arena.bytes_per_node()"""
+
+    def __init__(self):
+        self.states = []
+        self.parents = array('q')
+        self.costs = array('q')
+        self.depths = array('i')
+        self.actions = array('i')
+        self.action_codes = {}
+        self.action_table = []
+
+    def attach(self, problem):
+        """Make the searchers allocate the nodes of problem in this arena."""
+        problem.arena = self
+        return self
+
+    def add(self, state, parent, action, path_cost, depth):
+        """Store a node and return its index in the arena."""
+        code = self.action_codes.get(action)
+        if code is None:
+            code = self.action_codes[action] = len(self.action_table)
+            self.action_table.append(action)
+        if self.costs.typecode == 'q' and not isinstance(path_cost, (int, np.integer)):
+            self.costs = array('d', self.costs)
+        self.states.append(state)
+        self.parents.append(parent)
+        self.costs.append(path_cost)
+        self.depths.append(depth)
+        self.actions.append(code)
+        return len(self.states) - 1
+
+    def root(self, state):
+        """Return a handle on a new root node for state."""
+        return ArenaNode(self, self.add(state, -1, None, 0, 0), state)
+
+    def nbytes(self):
+        """The number of bytes the arena uses for its nodes, not counting
+        the state objects themselves (the states list holds references)."""
+        arrays = (self.parents, self.costs, self.depths, self.actions)
+        return sum(a.itemsize * len(a) for a in arrays) + 8 * len(self.states)
+
+    def bytes_per_node(self):
+        return self.nbytes() / max(len(self), 1)
+
+    def __len__(self):
+        return len(self.states)
+
+
+class ArenaNode:
+    """A handle on a node stored in a NodeArena. It behaves like a Node for
+    the searchers: parent, action, path_cost and depth are read from the
+    arena's arrays, and f and h can be cached on it as on a Node."""
+
+    __slots__ = ('arena', 'index', 'state', 'f', 'h')
+
+    def __init__(self, arena, index, state):
+        self.arena = arena
+        self.index = index
+        self.state = state
+
+    @property
+    def parent(self):
+        i = self.arena.parents[self.index]
+        return None if i < 0 else ArenaNode(self.arena, i, self.arena.states[i])
+
+    @property
+    def action(self):
+        return self.arena.action_table[self.arena.actions[self.index]]
+
+    @property
+    def path_cost(self):
+        return self.arena.costs[self.index]
+
+    @property
+    def depth(self):
+        return self.arena.depths[self.index]
+
+    def __repr__(self):
+        return "<Node {}>".format(self.state)
+
+    def __lt__(self, node):
+        return self.state < node.state
+
+    def expand(self, problem):
+        """List the nodes reachable in one step from this node."""
+        arena, state = self.arena, self.state
+        cost, depth = arena.costs[self.index], arena.depths[self.index] + 1
+        children = []
+        for action in problem.actions(state):
+            next_state = problem.result(state, action)
+            i = arena.add(next_state, self.index, action,
+                          problem.path_cost(cost, state, action, next_state), depth)
+            children.append(ArenaNode(arena, i, next_state))
+        return children
+
+    def child_node(self, problem, action):
+        next_state = problem.result(self.state, action)
+        i = self.arena.add(next_state, self.index, action,
+                           problem.path_cost(self.path_cost, self.state, action, next_state),
+                           self.depth + 1)
+        return ArenaNode(self.arena, i, next_state)
+
+    def solution(self):
+        """Return the sequence of actions to go from the root to this node."""
+        arena, i, actions = self.arena, self.index, []
+        while arena.parents[i] >= 0:
+            actions.append(arena.action_table[arena.actions[i]])
+            i = arena.parents[i]
+        return list(reversed(actions))
+
+    def path(self):
+        """Return a list of Nodes forming the path from the root to this node."""
+        arena, i, indices = self.arena, self.index, []
+        while i >= 0:
+            indices.append(i)
+            i = arena.parents[i]
+        path, node = [], None
+        for i in reversed(indices):
+            node = Node(arena.states[i], node, arena.action_table[arena.actions[i]], arena.costs[i])
+            path.append(node)
+        return path
+
+    def __eq__(self, other):
+        return isinstance(other, (Node, ArenaNode)) and self.state == other.state
+
+    def __hash__(self):
+        return hash(self.state)
+
+
+def root_node(problem):
+    """Return the root node of a search on problem: a plain Node, a
+    TracedNode if a SearchEvents sink is attached, or a handle in the
+    problem's NodeArena if one is attached (not both)."""
+    events = getattr(problem, 'events', None)
+    arena = getattr(problem, 'arena', None)
+    if events is not None and arena is not None:
+        raise ValueError('a problem cannot have both a SearchEvents sink and a NodeArena attached')
+    if events is not None:
+        return TracedNode(problem.initial, events=events)
+    if arena is not None:
+        return arena.root(problem.initial)
+    return Node(problem.initial)
+
+
+def explored_set(problem):
+    """Return an empty set for the explored states of a graph search on
+    problem; a TracedSet if a SearchEvents sink is attached."""
+    events = getattr(problem, 'events', None)
+    return set() if events is None else TracedSet(events)
+
+
+# ______________________________________________________________________________
+# Search events
+
+
+class SearchEvents:
+    """A sink for the events of a search, for visualization and tracing.
+    Attach it to a problem and every searcher reports (kind, state, cost)
+    events, kind being 'expand' and 'generate' (with the path cost of the
+    node), 'prune' (a state reached again after it was explored) and 'goal'.
+    Nothing is checked in the search loops: the searchers get TracedNodes
+    from root_node and a TracedSet from explored_set, and attach wraps
+    problem.goal_test, so a problem without a sink runs at full speed.
+    Events are buffered; with a callback, it is called with each batch of
+    batch_size events (and the rest on a goal or flush). Without one, a UI
+    can call drain each frame, even from another thread."""
+
+    def __init__(self, callback=None, batch_size=256):
+        self.callback = callback
+        self.batch_size = batch_size
+        self.buffer = deque()
+
+    def attach(self, problem):
+        """Trace the searches on problem, instead of any sink attached before; returns self."""
+        if getattr(problem, 'events', None) is not None:
+            problem.events.detach(problem)
+        goal_test = problem.goal_test
+
+        def traced_goal_test(state):
+            found = goal_test(state)
+            if found:
+                self.emit('goal', state, None)
+                self.flush()
+            return found
+
+        problem.goal_test = traced_goal_test
+        problem.events = self
+        return self
+
+    def detach(self, problem):
+        """Stop tracing problem."""
+        del problem.goal_test, problem.events
+
+    def emit(self, kind, state, cost):
+        self.buffer.append((kind, state, cost))
+        if self.callback is not None and len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def drain(self):
+        """Remove and return the buffered events, oldest first."""
+        buffer = self.buffer
+        return [buffer.popleft() for _ in range(len(buffer))]
+
+    def flush(self):
+        """Pass the buffered events to the callback, if there are any."""
+        if self.callback is not None and self.buffer:
+            self.callback(self.drain())
+
+
+class TracedNode(Node):
+    """A Node that reports its expansion, and the children it generates, to
+    a SearchEvents sink; its children are TracedNodes too."""
+
+    __slots__ = ('events',)
+
+    def __init__(self, state, parent=None, action=None, path_cost=0, events=None):
+        super().__init__(state, parent, action, path_cost)
+        self.events = events
+
+    def expand(self, problem):
+        self.events.emit('expand', self.state, self.path_cost)
+        return super().expand(problem)
+
+    def child_node(self, problem, action):
+        next_state = problem.result(self.state, action)
+        next_node = TracedNode(next_state, self, action,
+                               problem.path_cost(self.path_cost, self.state, action, next_state),
+                               self.events)
+        self.events.emit('generate', next_state, next_node.path_cost)
+        return next_node
+
+
+class TracedSet(set):
+    """A set of explored states that reports a 'prune' event to a SearchEvents
+    sink whenever a state is found to be in it."""
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def __contains__(self, state):
+        found = set.__contains__(self, state)
+        if found:
+            self.events.emit('prune', state, None)
+        return found
+
+
 # ______________________________________________________________________________
 
 
@@ -171,11 +450,249 @@ class SimpleProblemSolvingAgentProgram:
         raise NotImplementedError
 
 
+# ______________________________________________________________________________
+# Frontiers
+
+
+class Frontier:
+    """A queue of search Nodes that also keeps a hash set of their states,
+    so that `node in frontier` is O(1) rather than a scan of the queue.
+    A frontier holds at most one node per state; the graph searches check
+    membership before appending. max_size records the largest number of
+    nodes the frontier ever held, as a measure of the memory a search
+    needed. Subclasses decide the order in which nodes are popped."""
+
+    def __init__(self, nodes=()):
+        self.states = set()
+        self.max_size = 0
+        self.extend(nodes)
+
+    def append(self, node):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def extend(self, nodes):
+        """Append each node in turn; nodes may be a lazy iterable."""
+        for node in nodes:
+            self.append(node)
+
+    def _add(self, state):
+        states = self.states
+        states.add(state)
+        if len(states) > self.max_size:
+            self.max_size = len(states)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, node):
+        return node.state in self.states
+
+
+class FIFOFrontier(Frontier):
+    """A first-in-first-out frontier, for breadth-first search."""
+
+    def __init__(self, nodes=()):
+        self.queue = deque()
+        super().__init__(nodes)
+
+    def append(self, node):
+        self.queue.append(node)
+        self._add(node.state)
+
+    def pop(self):
+        node = self.queue.popleft()
+        self.states.discard(node.state)
+        return node
+
+
+class LIFOFrontier(Frontier):
+    """A last-in-first-out frontier (a stack), for depth-first search."""
+
+    def __init__(self, nodes=()):
+        self.queue = []
+        super().__init__(nodes)
+
+    def append(self, node):
+        self.queue.append(node)
+        self._add(node.state)
+
+    def pop(self):
+        node = self.queue.pop()
+        self.states.discard(node.state)
+        return node
+
+
+class PriorityFrontier(Frontier):
+    """A frontier that pops the node with the lowest f(node) first.
+    queue is the priority queue class to use underneath; also supports
+    frontier[node] to get the f value stored for node's state, del and
+    decrease_key, as PriorityQueue does."""
+
+    def __init__(self, f, nodes=(), queue=IndexedPriorityQueue):
+        self.queue = queue('min', f)
+        super().__init__(nodes)
+
+    def append(self, node):
+        self.queue.append(node)
+        self._add(node.state)
+
+    def pop(self):
+        node = self.queue.pop()
+        self.states.discard(node.state)
+        return node
+
+    def __getitem__(self, node):
+        return self.queue[node]
+
+    def __delitem__(self, node):
+        del self.queue[node]
+        self.states.discard(node.state)
+
+    def decrease_key(self, node):
+        self.queue.decrease_key(node)
+
+
+class BoundedPriorityFrontier(PriorityFrontier):
+    """A PriorityFrontier that never holds more than maxsize nodes: appending
+    to a full frontier drops whichever has the highest f, the new node or the
+    worst one held, which a second, max-ordered queue finds in O(log n).
+    evicted counts the nodes dropped. A search with it is no longer complete
+    or optimal, but its frontier memory has a hard ceiling. maxsize must be
+    at least 1."""
+
+    def __init__(self, f, maxsize, nodes=(), queue=IndexedPriorityQueue):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1, got {}'.format(maxsize))
+        self.maxsize = maxsize
+        self.evicted = 0
+        self.worst = IndexedPriorityQueue('max', f)
+        super().__init__(f, nodes, queue)
+
+    def append(self, node):
+        if len(self) >= self.maxsize:
+            self.evicted += 1
+            if self.queue.f(node) >= -self.worst[self.worst.peek()]:
+                return
+            PriorityFrontier.__delitem__(self, self.worst.pop())
+        super().append(node)
+        self.worst.append(node)
+
+    def pop(self):
+        node = super().pop()
+        del self.worst[node]
+        return node
+
+    def __delitem__(self, node):
+        super().__delitem__(node)
+        del self.worst[node]
+
+    def decrease_key(self, node):
+        super().decrease_key(node)
+        self.worst.decrease_key(node)
+
+
+# ______________________________________________________________________________
+# Search budgets
+
+
+class SearchBudget:
+    """Limits on a search, checked cooperatively by the searchers that take a
+    budget argument: at most max_expansions node expansions, a frontier of
+    at most max_frontier nodes, time_limit seconds of wall-clock time from
+    the creation of the budget, and an external cancel flag. The flag is set
+    with cancel(), or by setting cancel_event (any object with an is_set
+    method, such as a threading.Event or multiprocessing.Event) from
+    another thread or process. When a limit is hit the searcher returns a
+    BudgetExceeded instead of a solution. The budget also keeps statistics:
+    expansions, peak_frontier and the best node, which is the node with the
+    lowest key(node) expanded so far, or the last one expanded if key is None.
+    A budget may be shared by several searches, which then draw on it jointly."""
+
+    def __init__(self, max_expansions=None, time_limit=None, max_frontier=None, cancel_event=None,
+                 key=None):
+        self.max_expansions = max_expansions
+        self.max_frontier = max_frontier
+        self.start_time = time.monotonic()
+        self.deadline = None if time_limit is None else self.start_time + time_limit
+        self.cancel_event = cancel_event
+        self.cancelled = False
+        self.key = key
+        self.expansions = 0
+        self.peak_frontier = 0
+        self.best = None
+        self.reason = None
+
+    def cancel(self):
+        """Ask the search to stop at its next expansion."""
+        self.cancelled = True
+
+    def charge(self, node, frontier_size=0):
+        """Count the expansion of node, with frontier_size nodes on the
+        frontier. Return True if the search must stop instead."""
+        if self.exhausted(frontier_size):
+            return True
+        self.expansions += 1
+        if self.key is None or self.best is None or self.key(node) < self.key(self.best):
+            self.best = node
+        return False
+
+    def exhausted(self, frontier_size=0):
+        """Return True, and set reason, if a limit has been hit with
+        frontier_size nodes on the frontier. A searcher that cannot charge
+        each node itself (such as one whose expansions happen in other
+        processes) adds them to expansions and checks this instead."""
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        if self.max_expansions is not None and self.expansions >= self.max_expansions:
+            self.reason = 'expansions'
+        elif self.max_frontier is not None and frontier_size > self.max_frontier:
+            self.reason = 'frontier'
+        elif self.deadline is not None and time.monotonic() > self.deadline:
+            self.reason = 'time'
+        elif self.cancelled or (self.cancel_event is not None and self.cancel_event.is_set()):
+            self.reason = 'cancelled'
+        else:
+            return False
+        return True
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def exceeded(self):
+        """The result a searcher returns when the budget has run out."""
+        return BudgetExceeded(self.reason, self.best, self.expansions, self.peak_frontier,
+                              self.elapsed())
+
+
+class BudgetExceeded:
+    """The result of a search stopped by its SearchBudget: why it stopped
+    ('expansions', 'frontier', 'time' or 'cancelled'), the best node found
+    so far, and the search statistics at that point. It is false in a
+    boolean context, like a failed search's None."""
+
+    def __init__(self, reason, node, expansions, peak_frontier, elapsed):
+        self.reason = reason
+        self.node = node
+        self.expansions = expansions
+        self.peak_frontier = peak_frontier
+        self.elapsed = elapsed
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return '<BudgetExceeded {}: {} expansions, peak frontier {}, {:.3f}s, best {}>'.format(
+            self.reason, self.expansions, self.peak_frontier, self.elapsed, self.node)
+
+
 # ______________________________________________________________________________
 # Uninformed Search algorithms
 
 
-def breadth_first_tree_search(problem):
+def breadth_first_tree_search(problem, budget=None):
     """
     [Figure 3.7]
     Search the shallowest nodes in the search tree first.
@@ -184,17 +701,19 @@ def breadth_first_tree_search(problem):
     Repeats infinitely in case of loops.
     """
 
-    frontier = deque([Node(problem.initial)])  # FIFO queue
+    frontier = deque([root_node(problem)])  # FIFO queue
 
     while frontier:
         node = frontier.popleft()
         if problem.goal_test(node.state):
             return node
+        if budget is not None and budget.charge(node, len(frontier)):
+            return budget.exceeded()
         frontier.extend(node.expand(problem))
     return None
 
 
-def depth_first_tree_search(problem):
+def depth_first_tree_search(problem, budget=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
@@ -203,17 +722,19 @@ def depth_first_tree_search(problem):
     Repeats infinitely in case of loops.
     """
 
-    frontier = [Node(problem.initial)]  # Stack
+    frontier = [root_node(problem)]  # Stack
 
     while frontier:
         node = frontier.pop()
         if problem.goal_test(node.state):
             return node
+        if budget is not None and budget.charge(node, len(frontier)):
+            return budget.exceeded()
         frontier.extend(node.expand(problem))
     return None
 
 
-def depth_first_graph_search(problem):
+def depth_first_graph_search(problem, display=False, budget=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
@@ -222,102 +743,198 @@ def depth_first_graph_search(problem):
     Does not get trapped by loops.
     If two paths reach a state, only use the first one.
     """
-    frontier = [(Node(problem.initial))]  # Stack
+    frontier = LIFOFrontier([root_node(problem)])  # Stack
 
-    explored = set()
+    explored = explored_set(problem)
     while frontier:
         node = frontier.pop()
         if problem.goal_test(node.state):
+            if display:
+                print("{} paths have been expanded and {} paths remain in the frontier "
+                      "(peak {})".format(len(explored), len(frontier), frontier.max_size))
             return node
+        if budget is not None and budget.charge(node, len(frontier)):
+            return budget.exceeded()
         explored.add(node.state)
         frontier.extend(child for child in node.expand(problem)
                         if child.state not in explored and child not in frontier)
     return None
 
 
-def breadth_first_graph_search(problem):
+def breadth_first_graph_search(problem, display=False, budget=None):
     """[Figure 3.11]
     Note that this function can be implemented in a
     single line as below:
     return graph_search(problem, FIFOQueue())
     """
-    node = Node(problem.initial)
+    node = root_node(problem)
     if problem.goal_test(node.state):
         return node
-    frontier = deque([node])
-    explored = set()
+    frontier = FIFOFrontier([node])
+    explored = explored_set(problem)
     while frontier:
-        node = frontier.popleft()
+        node = frontier.pop()
+        if budget is not None and budget.charge(node, len(frontier)):
+            return budget.exceeded()
         explored.add(node.state)
         for child in node.expand(problem):
             if child.state not in explored and child not in frontier:
                 if problem.goal_test(child.state):
+                    if display:
+                        print("{} paths have been expanded and {} paths remain in the frontier "
+                              "(peak {})".format(len(explored), len(frontier), frontier.max_size))
                     return child
                 frontier.append(child)
     return None
 
 
-def best_first_graph_search(problem, f, display=False):
+def best_first_graph_search(problem, f, display=False, queue=IndexedPriorityQueue, budget=None,
+                            h_batch=None, frontier_cap=None, stats=None):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
     There is a subtlety: the line "f = memoize(f, 'f')" means that the f
     values will be cached on the nodes as they are computed. So after doing
-    a best first search you can examine the f values of the path returned."""
+    a best first search you can examine the f values of the path returned.
+    The frontier is an IndexedPriorityQueue by default; pass
+    queue=PriorityQueue to use the original list-scanning queue instead.
+    A SearchBudget can be given to limit the search (as for the other
+    searchers); if it runs out, a BudgetExceeded is returned.
+    If h_batch is given, it is called with the states of the unexplored
+    children of each expansion and must return their h values, which are
+    cached on the children before f is evaluated (see astar_search).
+    If frontier_cap is given, the frontier is a BoundedPriorityFrontier of
+    that size (see bounded_best_first_graph_search); if stats is a dict, the
+    number of nodes it evicted is stored in stats['evicted']."""
     f = memoize(f, 'f')
-    node = Node(problem.initial)
-    frontier = PriorityQueue('min', f)
-    frontier.append(node)
-    explored = set()
+    node = root_node(problem)
+    if frontier_cap is None:
+        frontier = PriorityFrontier(f, [node], queue)
+    else:
+        frontier = BoundedPriorityFrontier(f, frontier_cap, [node], queue)
+    explored = explored_set(problem)
     while frontier:
         node = frontier.pop()
         if problem.goal_test(node.state):
+            evicted = getattr(frontier, 'evicted', 0)
             if display:
-                print(len(explored), "paths have been expanded and", len(frontier), "paths remain in the frontier")
+                print("{} paths have been expanded and {} paths remain in the frontier "
+                      "(peak {}, {} evicted)".format(len(explored), len(frontier),
+                                                     frontier.max_size, evicted))
+            if stats is not None:
+                stats['evicted'] = evicted
             return node
+        if budget is not None and budget.charge(node, len(frontier)):
+            return budget.exceeded()
         explored.add(node.state)
-        for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+        children = [child for child in node.expand(problem) if child.state not in explored]
+        if h_batch is not None and children:
+            for child, h in zip(children, h_batch([child.state for child in children])):
+                child.h = h
+        for child in children:
+            if child not in frontier:
                 frontier.append(child)
-            elif child in frontier:
-                if f(child) < frontier[child]:
-                    del frontier[child]
-                    frontier.append(child)
+            elif f(child) < frontier[child]:
+                frontier.decrease_key(child)
+    if stats is not None:
+        stats['evicted'] = getattr(frontier, 'evicted', 0)
     return None
 
 
-def uniform_cost_search(problem, display=False):
+def uniform_cost_search(problem, display=False, budget=None):
     """[Figure 3.14]"""
-    return best_first_graph_search(problem, lambda node: node.path_cost, display)
-
-
-def depth_limited_search(problem, limit=50):
-    """[Figure 3.17]"""
-
-    def recursive_dls(node, problem, limit):
-        if problem.goal_test(node.state):
-            return node
-        elif limit == 0:
-            return 'cutoff'
-        else:
-            cutoff_occurred = False
-            for child in node.expand(problem):
-                result = recursive_dls(child, problem, limit - 1)
-                if result == 'cutoff':
-                    cutoff_occurred = True
-                elif result is not None:
-                    return result
-            return 'cutoff' if cutoff_occurred else None
-
-    # Body of depth_limited_search:
-    return recursive_dls(Node(problem.initial), problem, limit)
+    return best_first_graph_search(problem, lambda node: node.path_cost, display, budget=budget)
+
+
+class TranspositionTable:
+    """A bounded map from each state to the shallowest depth at which a
+    depth-limited search has reached it. A state reached again at the same
+    depth or deeper has nothing new below it within the limit and can be
+    pruned. When maxsize states are stored the oldest is evicted, which
+    only costs re-expanding that state if it is reached again."""
+
+    def __init__(self, maxsize=10 ** 6):
+        self.maxsize = maxsize
+        self.depths = collections.OrderedDict()
+
+    def visit(self, state, depth):
+        """Record that state was reached at depth. Return False if it had
+        already been reached at that depth or shallower."""
+        depths = self.depths
+        seen = depths.get(state)
+        if seen is not None:
+            if seen <= depth:
+                return False
+            del depths[state]
+        elif len(depths) >= self.maxsize:
+            depths.popitem(last=False)
+        depths[state] = depth
+        return True
+
+    def clear(self):
+        self.depths.clear()
 
-
-def iterative_deepening_search(problem):
-    """[Figure 3.18]"""
+    def __len__(self):
+        return len(self.depths)
+
+
+def depth_limited_search(problem, limit=50, table=None, budget=None):
+    """[Figure 3.17]
+    Implemented with an explicit stack rather than recursion, so deep limits
+    cannot overflow Python's stack. If a TranspositionTable is given, states
+    already reached at the same depth or shallower are pruned."""
+    return depth_limited_expansions(problem, limit, table, budget)[0]
+
+
+def depth_limited_expansions(problem, limit, table=None, budget=None):
+    """The body of depth_limited_search: return its result, and the number
+    of nodes expanded."""
+    root = root_node(problem)
+    if problem.goal_test(root.state):
+        return root, 0
+    if limit == 0:
+        return 'cutoff', 0
+    if table is not None:
+        table.visit(root.state, 0)
+    if budget is not None and budget.charge(root, 0):
+        return budget.exceeded(), 0
+    cutoff_occurred = False
+    stack = [iter(root.expand(problem))]
+    expanded = 1
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            continue
+        depth = len(stack)
+        if table is not None and not table.visit(child.state, depth):
+            continue
+        if problem.goal_test(child.state):
+            return child, expanded
+        if depth == limit:
+            cutoff_occurred = True
+            continue
+        if budget is not None and budget.charge(child, len(stack)):
+            return budget.exceeded(), expanded
+        stack.append(iter(child.expand(problem)))
+        expanded += 1
+    return ('cutoff' if cutoff_occurred else None), expanded
+
+
+def iterative_deepening_search(problem, table_size=None, display=False, budget=None):
+    """[Figure 3.18]
+    With table_size, each depth-limited search uses a TranspositionTable of
+    that many states, so no state is expanded twice at the same depth within
+    one iteration; on graphs with cycles this avoids expanding an exponential
+    number of paths. With display, the expansions per depth are printed."""
+    table = TranspositionTable(table_size) if table_size else None
     for depth in range(sys.maxsize):
-        result = depth_limited_search(problem, depth)
+        if table is not None:
+            table.clear()
+        result, expanded = depth_limited_expansions(problem, depth, table, budget)
+        if display:
+            print("depth {}: {} nodes expanded".format(depth, expanded))
         if result != 'cutoff':
             return result
 
@@ -326,80 +943,186 @@ def iterative_deepening_search(problem):
 # Bidirectional Search
 # Pseudocode from https://webdocs.cs.ualberta.ca/%7Eholte/Publications/MM-AAAI2016.pdf
 
-def bidirectional_search(problem):
-    e = 0
-    if isinstance(problem, GraphProblem):
-        e = problem.find_min_edge()
-    gF, gB = {Node(problem.initial): 0}, {Node(problem.goal): 0}
-    openF, openB = [Node(problem.initial)], [Node(problem.goal)]
-    closedF, closedB = [], []
-    U = np.inf
-
-    def extend(U, open_dir, open_other, g_dir, g_other, closed_dir):
-        """Extend search in given direction"""
-        n = find_key(C, open_dir, g_dir)
-
-        open_dir.remove(n)
-        closed_dir.append(n)
+class MMFrontier:
+    """One direction of the meet-in-the-middle (MM) bidirectional_search.
+    The open list is kept in three indexed heaps, keyed on MM's priority
+    max(g+h, 2g) (ties broken by lowest g), on f = g+h and on g, so that
+    the minima MM needs are all O(1) and updates are O(log n). best maps
+    each state reached in this direction (open or closed) to its cheapest
+    node, and heuristic values are cached per state."""
 
-        for c in n.expand(problem):
-            if c in open_dir or c in closed_dir:
-                if g_dir[c] <= problem.path_cost(g_dir[n], n.state, None, c.state):
-                    continue
-
-                open_dir.remove(c)
+    def __init__(self, problem):
+        self.problem = problem
+        self.h_cache = {}
+        self.best = {}
+        self.by_priority = IndexedPriorityQueue('min', self.priority)
+        self.by_f = IndexedPriorityQueue('min', self.f)
+        self.by_g = IndexedPriorityQueue('min', lambda n: n.path_cost)
+        self.add(root_node(problem))
 
-            g_dir[c] = problem.path_cost(g_dir[n], n.state, None, c.state)
-            open_dir.append(c)
+    def h(self, node):
+        """problem.h, with an infinite estimate (such as GraphProblem.h on a
+        graph without locations) read as 0 so that the MM stopping rule
+        stays admissible."""
+        value = self.h_cache.get(node.state)
+        if value is None:
+            value = self.problem.h(node)
+            value = self.h_cache[node.state] = 0 if value == np.inf else value
+        return value
+
+    def f(self, node):
+        return node.path_cost + self.h(node)
+
+    def priority(self, node):
+        g = node.path_cost
+        return max(g + self.h(node), 2 * g), g
+
+    def add(self, node):
+        """Open node, as the best path found to its state so far."""
+        self.best[node.state] = node
+        self.by_priority.append(node)
+        self.by_f.append(node)
+        self.by_g.append(node)
+
+    def pop(self):
+        """Close and return the open node with the lowest priority."""
+        node = self.by_priority.pop()
+        del self.by_f[node]
+        del self.by_g[node]
+        return node
 
-            if c in open_other:
-                U = min(U, g_dir[c] + g_other[c])
+    def reopen(self, node):
+        """Replace the node for node.state, which may be open or closed."""
+        if node in self.by_priority:
+            del self.by_priority[node]
+            del self.by_f[node]
+            del self.by_g[node]
+        self.add(node)
 
-        return U, open_dir, closed_dir, g_dir
+    def is_open(self, state):
+        node = self.best.get(state)
+        return node is not None and node in self.by_priority
 
-    def find_min(open_dir, g):
-        """Finds minimum priority, g and f values in open_dir"""
-        # pr_min_f isn't forward pr_min instead it's the f-value
-        # of node with priority pr_min.
-        pr_min, pr_min_f = np.inf, np.inf
-        for n in open_dir:
-            f = g[n] + problem.h(n)
-            pr = max(f, 2 * g[n])
-            pr_min = min(pr_min, pr)
-            pr_min_f = min(pr_min_f, f)
+    def min_priority(self):
+        return self.by_priority[self.by_priority.peek()][0]
 
-        return pr_min, pr_min_f, min(g.values())
+    def min_f(self):
+        return self.by_f[self.by_f.peek()]
 
-    def find_key(pr_min, open_dir, g):
-        """Finds key in open_dir with value equal to pr_min
-        and minimum g value."""
-        m = np.inf
-        node = Node(-1)
-        for n in open_dir:
-            pr = max(g[n] + problem.h(n), 2 * g[n])
-            if pr == pr_min:
-                if g[n] < m:
-                    m = g[n]
-                    node = n
+    def min_g(self):
+        return self.by_g[self.by_g.peek()]
 
-        return node
+    def __len__(self):
+        return len(self.by_priority)
+
+
+def bidirectional_search(problem, budget=None):
+    """Meet-in-the-middle bidirectional heuristic search (MM, Holte et al.
+    2016). Searches forward from problem.initial and backward from
+    problem.goal, always expanding the open node with the lowest
+    max(g+h, 2g) over both directions, and stops once the best meeting
+    path found is provably optimal. Returns the joined solution Node (or
+    None). The problem must be reversible: the backward search expands the
+    goal with the same actions and result, on the problem of
+    reverse_problem. If problem is an InstrumentedProblem, the backward
+    expansions are counted on it too."""
+    if problem.goal_test(problem.initial):
+        return root_node(problem)
+    wrappers, reverse = [], problem
+    while isinstance(reverse, InstrumentedProblem):
+        wrappers.append(reverse)
+        reverse = reverse.problem
+    reverse = reverse_problem(reverse)
+    if wrappers:
+        reverse = InstrumentedProblem(reverse)
+    try:
+        return mm_search(problem, reverse, budget)
+    finally:
+        for wrapper in wrappers:
+            wrapper.succs += reverse.succs
+            wrapper.goal_tests += reverse.goal_tests
+            wrapper.states += reverse.states
+
+
+def mm_search(problem, reverse, budget=None):
+    """The search of bidirectional_search, forward on problem and backward
+    on reverse."""
+    e = 0
+    if isinstance(problem, GraphProblem):
+        e = problem.find_min_edge()
+    forward, backward = MMFrontier(problem), MMFrontier(reverse)
+    U, meeting = np.inf, None
 
-    while openF and openB:
-        pr_min_f, f_min_f, g_min_f = find_min(openF, gF)
-        pr_min_b, f_min_b, g_min_b = find_min(openB, gB)
+    while forward and backward:
+        pr_min_f, pr_min_b = forward.min_priority(), backward.min_priority()
         C = min(pr_min_f, pr_min_b)
+        if meeting is not None and U <= max(C, forward.min_f(), backward.min_f(),
+                                            forward.min_g() + backward.min_g() + e):
+            return join_bidirectional_path(problem, *meeting)
+
+        this, other = (forward, backward) if C == pr_min_f else (backward, forward)
+        node = this.pop()
+        if budget is not None and budget.charge(node, len(forward) + len(backward)):
+            return budget.exceeded()
+        for child in node.expand(this.problem):
+            old = this.best.get(child.state)
+            if old is not None:
+                if old.path_cost <= child.path_cost:
+                    continue
+                this.reopen(child)
+            else:
+                this.add(child)
+            if other.is_open(child.state):
+                cost = child.path_cost + other.best[child.state].path_cost
+                if cost < U:
+                    U = cost
+                    match = other.best[child.state]
+                    meeting = (child, match) if this is forward else (match, child)
+
+    if meeting is not None:
+        return join_bidirectional_path(problem, *meeting)
+    return None
 
-        if U <= max(C, f_min_f, f_min_b, g_min_f + g_min_b + e):
-            return U
 
-        if C == pr_min_f:
-            # Extend forward
-            U, openF, closedF, gF = extend(U, openF, openB, gF, gB, closedF)
+def reverse_problem(problem):
+    """The problem of the backward search of bidirectional_search: a copy of
+    problem with initial and goal swapped, and for a GraphProblem on a
+    directed graph, on graph.reversed(). A BoundHeuristic set on the problem
+    (by an attach method) is rebound to the copy, if the graph is not
+    reversed; any other h set on the instance cannot be told about the new
+    goal and direction, so 0 is used."""
+    reverse = copy.copy(problem)
+    reverse.initial, reverse.goal = problem.goal, problem.initial
+    reversed_graph = isinstance(problem, GraphProblem) and problem.graph.directed
+    if reversed_graph:
+        if not hasattr(problem.graph, 'reversed'):
+            raise ValueError('cannot search the directed {} backwards'.format(
+                type(problem.graph).__name__))
+        reverse.graph = problem.graph.reversed()
+    h = vars(problem).get('h')
+    if h is not None:
+        if isinstance(h, BoundHeuristic) and not reversed_graph:
+            h = h.rebind(reverse)
         else:
-            # Extend backward
-            U, openB, closedB, gB = extend(U, openB, openF, gB, gF, closedB)
-
-    return np.inf
+            h = None
+        reverse.h = h or (lambda node: 0)
+    return reverse
+
+
+def join_bidirectional_path(problem, forward_node, backward_node):
+    """Extend forward_node along the path of backward_node (a node of the
+    backward search, with the same state) to the goal, and return the
+    resulting Node."""
+    node = forward_node
+    for state in [n.state for n in backward_node.path()][-2::-1]:
+        action = first(a for a in problem.actions(node.state)
+                       if problem.result(node.state, a) == state)
+        if action is None:
+            raise ValueError('No action leads from {} to {}; the problem is not reversible.'.format(
+                node.state, state))
+        node = Node(state, node, action,
+                    problem.path_cost(node.path_cost, node.state, action, state))
+    return node
 
 
 # ______________________________________________________________________________
@@ -412,12 +1135,285 @@ greedy_best_first_graph_search = best_first_graph_search
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
 
 
-def astar_search(problem, h=None, display=False):
+def batch_heuristic(problem):
+    """Return the h_batch of problem if it scores states with the same
+    heuristic as problem.h, else None. An h set on the instance only goes
+    with an h_batch set on the instance, and an h defined in a class only
+    with an h_batch defined in that class or a subclass of it, so a custom
+    h is never overruled by an inherited h_batch."""
+    while isinstance(problem, InstrumentedProblem):
+        problem = problem.problem
+    attrs = vars(problem)
+    if 'h' in attrs or 'h_batch' in attrs:
+        return attrs.get('h_batch')
+    mro = type(problem).__mro__
+    h_owner = next((c for c in mro if 'h' in vars(c)), None)
+    batch_owner = next((c for c in mro if 'h_batch' in vars(c)), None)
+    if batch_owner is None or (h_owner is not None and not issubclass(batch_owner, h_owner)):
+        return None
+    return problem.h_batch
+
+
+class BoundHeuristic:
+    """The heuristic that an attach(problem) method installs as problem.h
+    (or, with batch=True, as problem.h_batch): a picklable callable that
+    asks source for the value of a node (or the list of values of a list of
+    states) for the goal of problem, so the problem can still be sent to
+    other processes. inner is the heuristic it wraps, None for the one
+    defined by the class of problem. rebind(problem) returns the same
+    heuristic for a copy of the problem with another goal, or None if inner
+    is not a BoundHeuristic and so cannot follow the goal."""
+
+    def __init__(self, source, problem, batch=False, inner=None):
+        self.source, self.problem, self.batch, self.inner = source, problem, batch, inner
+
+    def __call__(self, x):
+        if self.batch:
+            return self.source.heuristic_batch(self.problem, x, self.inner)
+        return self.source.heuristic(self.problem, x, self.inner)
+
+    def rebind(self, problem):
+        inner = self.inner
+        if inner is not None:
+            inner = inner.rebind(problem) if isinstance(inner, BoundHeuristic) else None
+            if inner is None:
+                return None
+        return BoundHeuristic(self.source, problem, self.batch, inner)
+
+
+class HeuristicCache:
+    """A cache of heuristic values keyed by (state, goal), for a problem that
+    is searched again and again: attach(problem) replaces problem.h (and
+    problem.h_batch, if it has one) by versions that look values up here
+    first, so every searcher, and every later search on the problem, reuses
+    them. memoize only caches h on each Node, so two nodes with the same
+    state would compute it twice. When maxsize values are cached the least
+    recently used is evicted. hits, misses and evictions count lookups."""
+
+    def __init__(self, maxsize=10 ** 6):
+        self.maxsize = maxsize
+        self.values = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def attach(self, problem):
+        """Cache the heuristic of problem; returns self."""
+        h_batch = batch_heuristic(problem)
+        h = vars(problem).get('h', None if hasattr(type(problem), 'h') else problem.h)
+        problem.h = BoundHeuristic(self, problem, inner=h)
+        if h_batch is not None:
+            if hasattr(type(problem), 'h_batch'):
+                h_batch = None
+            h_batch = vars(problem).get('h_batch', h_batch)
+            problem.h_batch = BoundHeuristic(self, problem, True, h_batch)
+        problem.heuristic_cache = self
+        return self
+
+    @staticmethod
+    def key(problem, state):
+        goal = problem.goal
+        return state, tuple(goal) if isinstance(goal, list) else goal
+
+    def heuristic(self, problem, node, inner=None):
+        """The h value of node for problem, from the cache if it is there."""
+        k = self.key(problem, node.state)
+        value = self.get(k)
+        if value is None:
+            value = inner(node) if inner is not None else type(problem).h(problem, node)
+            self.put(k, value)
+        return value
+
+    def heuristic_batch(self, problem, states, inner=None):
+        """The h values of states for problem, computing the missing ones
+        with one h_batch call."""
+        keys = [self.key(problem, state) for state in states]
+        values = [self.get(k) for k in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            batch = [states[i] for i in missing]
+            computed = inner(batch) if inner is not None else type(problem).h_batch(problem, batch)
+            for i, value in zip(missing, computed):
+                values[i] = self.put(keys[i], value)
+        return values
+
+    def detach(self, problem):
+        """Restore the heuristics of problem that attach wrapped: the ones it
+        had on the instance are put back, the ones of its class uncovered."""
+        for attr in ('h', 'h_batch'):
+            bound = vars(problem).get(attr)
+            if isinstance(bound, BoundHeuristic) and bound.source is self:
+                if bound.inner is None:
+                    del problem.__dict__[attr]
+                else:
+                    setattr(problem, attr, bound.inner)
+        problem.__dict__.pop('heuristic_cache', None)
+
+    def get(self, key):
+        """Return the value cached for key and mark it recently used, or None."""
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        values = self.values
+        if len(values) >= self.maxsize:
+            values.popitem(last=False)
+            self.evictions += 1
+        values[key] = value
+        return value
+
+    def clear(self):
+        self.values.clear()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return '<HeuristicCache {} values: {} hits, {} misses, {} evictions>'.format(
+            len(self), self.hits, self.misses, self.evictions)
+
+
+def astar_search(problem, h=None, display=False, budget=None, weight=1, batch=False):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
-    else in your Problem subclass."""
+    else in your Problem subclass. If batch is true, h is not specified and
+    the problem also has a matching h_batch(states) method (see
+    batch_heuristic), the children of each expansion are scored with one
+    h_batch call instead of one h call per child. That only pays off when
+    h is costly, or nodes have many children: a NumPy call per expansion
+    costs more than a few scalar h calls.
+    With weight w > 1 this is weighted A*, f(n) = g(n) + w*h(n): usually
+    far fewer expansions, for a solution costing at most w times the optimal
+    (for a consistent h)."""
+    h_batch = batch_heuristic(problem) if batch and h is None else None
+    h = memoize(h or problem.h, 'h')
+    return best_first_graph_search(problem, lambda n: n.path_cost + weight * h(n), display,
+                                   budget=budget, h_batch=h_batch)
+
+
+def bounded_best_first_graph_search(problem, f, max_frontier=1000, display=False, budget=None,
+                                    stats=None):
+    """Best-first graph search whose frontier holds at most max_frontier
+    nodes, evicting those with the highest f past the cap: a hard memory
+    ceiling in exchange for completeness. With f = g + h this is a
+    memory-bounded A*. The number of evictions is stored in stats['evicted']
+    if stats is a dict."""
+    return best_first_graph_search(problem, f, display, budget=budget, frontier_cap=max_frontier,
+                                   stats=stats)
+
+
+def beam_search(problem, beam_width=100, h=None, display=False, budget=None, stats=None):
+    """Breadth-wise beam search: expand every node of a layer, then keep only
+    the beam_width children with the lowest f = g + h as the next layer. At
+    most beam_width nodes are held, but it may miss every solution. States
+    are never revisited. The number of children dropped from the beams is
+    stored in stats['evicted'] if stats is a dict."""
     h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, lambda n: n.path_cost + h(n), display)
+
+    def f(n):
+        return n.path_cost + h(n)
+
+    layer = [root_node(problem)]
+    explored = explored_set(problem)
+    explored.add(layer[0].state)
+    evicted = expanded = 0
+    while layer:
+        for node in layer:
+            if problem.goal_test(node.state):
+                if display:
+                    print("{} paths have been expanded and {} paths evicted".format(
+                        expanded, evicted))
+                if stats is not None:
+                    stats['evicted'] = evicted
+                return node
+        children = {}
+        for node in layer:
+            if budget is not None and budget.charge(node, len(layer)):
+                return budget.exceeded()
+            expanded += 1
+            for child in node.expand(problem):
+                best = children.get(child.state)
+                if child.state not in explored and (best is None
+                                                    or child.path_cost < best.path_cost):
+                    children[child.state] = child
+        layer = heapq.nsmallest(beam_width, children.values(), key=f)
+        evicted += len(children) - len(layer)
+        explored.update(child.state for child in layer)
+    if stats is not None:
+        stats['evicted'] = evicted
+    return None
+
+
+def anytime_repairing_astar(problem, h=None, weight=3, step=0.5, budget=None):
+    """Anytime Repairing A* (ARA*) [Likhachev, Gordon and Thrun 2003]: a
+    generator of (node, bound) pairs, each a solution cheaper than the last
+    and a bound on how many times the optimal cost it may be. It starts as
+    weighted A* with the given weight, then lowers the weight by step at a
+    time down to 1, keeping its g values and frontier between iterations:
+    only states whose g improved after they were expanded (the inconsistent
+    ones) are reconsidered. The last bound yielded is 1 unless a SearchBudget
+    (e.g. with a time_limit for a deadline) runs out first, which ends it."""
+    h = memoize(h or problem.h, 'h')
+    node = root_node(problem)
+    best = {node.state: node}
+    closed, incons = set(), {}
+    goal = node if problem.goal_test(node.state) else None
+    reported = (None, np.inf)
+
+    def f(n):
+        return n.path_cost + weight * h(n)
+
+    frontier = IndexedPriorityQueue('min', f)
+    frontier.append(node)
+    while True:
+        while frontier and (goal is None or goal.path_cost > frontier[frontier.peek()]):
+            node = frontier.pop()
+            if budget is not None and budget.charge(node, len(frontier)):
+                return
+            closed.add(node.state)
+            for child in node.expand(problem):
+                if child.state not in best or child.path_cost < best[child.state].path_cost:
+                    best[child.state] = child
+                    if problem.goal_test(child.state) and (goal is None
+                                                           or child.path_cost < goal.path_cost):
+                        goal = child
+                    if child.state in closed:
+                        incons[child.state] = child
+                    elif child in frontier:
+                        frontier.decrease_key(child)
+                    else:
+                        frontier.append(child)
+        if goal is None:
+            return
+        lower = min([n.path_cost + h(n) for n in itertools.chain(frontier.index, incons.values())],
+                    default=goal.path_cost)
+        bound = max(1, min(weight, goal.path_cost / lower) if lower > 0 else weight)
+        if goal is not reported[0] or bound < reported[1]:
+            reported = (goal, bound)
+            yield reported
+        if bound == 1:
+            return
+        weight = max(1, weight - step)
+        frontier_nodes = list(frontier.index) + list(incons.values())
+        frontier = IndexedPriorityQueue('min', f)
+        frontier.extend(frontier_nodes)
+        closed, incons = set(), {}
+
+
+def anytime_astar_search(problem, h=None, weight=3, step=0.5, budget=None, callback=None):
+    """Run anytime_repairing_astar, calling callback(node, bound) on each
+    improved solution, and return the last (best) one. If the budget runs
+    out before any solution is found, return its BudgetExceeded."""
+    result = None
+    for result, bound in anytime_repairing_astar(problem, h, weight, step, budget):
+        if callback is not None:
+            callback(result, bound)
+    if result is None and budget is not None and budget.reason:
+        return budget.exceeded()
+    return result
 
 
 # ______________________________________________________________________________
@@ -493,6 +1489,263 @@ class EightPuzzle(Problem):
         return sum(s != g for (s, g) in zip(node.state, self.goal))
 
 
+def packed_move_tables():
+    """For PackedEightPuzzle: the actions for each blank square, and for each
+    (blank, action) the shift of the tile that moves, the shift it moves to,
+    and the change to the blank field of the packed state."""
+    actions, moves = {}, {}
+    for blank in range(9):
+        actions[blank] = tuple(action for action, legal in [('UP', blank >= 3), ('DOWN', blank < 6),
+                                                            ('LEFT', blank % 3 != 0),
+                                                            ('RIGHT', blank % 3 != 2)] if legal)
+        for action in actions[blank]:
+            neighbor = blank + {'UP': -3, 'DOWN': 3, 'LEFT': -1, 'RIGHT': 1}[action]
+            moves[blank, action] = (4 * neighbor, 4 * blank, (neighbor - blank) << 36)
+    return actions, moves
+
+
+class PackedEightPuzzle(EightPuzzle):
+    """ The EightPuzzle with each state packed into one int: 4 bits per square,
+    square i in bits 4i..4i+3, and the index of the blank in bits 36..39.
+    Successors come from move tables precomputed per blank square, so result
+    is a few bit operations, and states hash and compare as small ints. Use
+    pack and unpack to convert from and to the tuples of EightPuzzle. """
+
+    BLANK_SHIFT = 36
+    TILE_MASK = (1 << 36) - 1
+    ACTIONS, MOVES = packed_move_tables()
+
+    def __init__(self, initial, goal=(1, 2, 3, 4, 5, 6, 7, 8, 0)):
+        """ Define goal state and initialize a problem; tuples are packed """
+        super().__init__(self.pack(initial), self.pack(goal))
+
+    @classmethod
+    def pack(cls, state):
+        """ Return the int encoding of a tuple state (ints are returned as is) """
+        if isinstance(state, int):
+            return state
+        packed = state.index(0) << cls.BLANK_SHIFT
+        for i, tile in enumerate(state):
+            packed |= tile << (4 * i)
+        return packed
+
+    @staticmethod
+    def unpack(state):
+        """ Return the tuple of length 9 encoded by an int state """
+        return tuple((state >> (4 * i)) & 15 for i in range(9))
+
+    def find_blank_square(self, state):
+        """Return the index of the blank square in a given state"""
+        return state >> self.BLANK_SHIFT
+
+    def actions(self, state):
+        """ Return the actions that can be executed in the given state """
+        return self.ACTIONS[state >> self.BLANK_SHIFT]
+
+    def result(self, state, action):
+        """ Given state and action, return a new state that is the result of the action.
+        Action is assumed to be a valid action in the state """
+        source, target, blank_delta = self.MOVES[state >> self.BLANK_SHIFT, action]
+        tile = (state >> source) & 15
+        return state - (tile << source) + (tile << target) + blank_delta
+
+    def check_solvability(self, state):
+        """ Checks if the given state is solvable: the tiles, read in order, must be
+        an even permutation """
+        tiles = [t for t in self.unpack(self.pack(state)) if t != 0]
+        return permutation_parity(tiles) == 0
+
+    def h(self, node):
+        """ The number of misplaced squares, as in EightPuzzle: the nonzero nibbles
+        of the XOR of the state with the goal """
+        x = (node.state ^ self.goal) & self.TILE_MASK
+        return bin((x | x >> 1 | x >> 2 | x >> 3) & 0x111111111).count('1')
+
+
+# ______________________________________________________________________________
+
+
+class SlidingTilePuzzle(EightPuzzle):
+    """The EightPuzzle generalized to an N x N board: the 15-puzzle for N = 4,
+    the 24-puzzle for N = 5. States are tuples of length N*N as in
+    EightPuzzle, with 0 for the blank, and N is taken from the length of the
+    initial state. The default heuristic is the Manhattan distance; pass an
+    AdditivePatternDatabase as h to astar_search for a much stronger one."""
+
+    def __init__(self, initial, goal=None):
+        """ Define goal state and initialize a problem """
+        n = exact_sqrt(len(initial))
+        if goal is None:
+            goal = tuple(range(1, n * n)) + (0,)
+        super().__init__(initial, goal)
+        self.n = n
+        self.goal_positions = {tile: i for i, tile in enumerate(goal)}
+
+    def actions(self, state):
+        """ Return the actions that can be executed in the given state. """
+        n = self.n
+        blank = self.find_blank_square(state)
+        possible_actions = []
+        if blank >= n:
+            possible_actions.append('UP')
+        if blank < n * n - n:
+            possible_actions.append('DOWN')
+        if blank % n != 0:
+            possible_actions.append('LEFT')
+        if blank % n != n - 1:
+            possible_actions.append('RIGHT')
+        return possible_actions
+
+    def result(self, state, action):
+        """ Given state and action, return a new state that is the result of the action.
+        Action is assumed to be a valid action in the state """
+        blank = self.find_blank_square(state)
+        neighbor = blank + {'UP': -self.n, 'DOWN': self.n, 'LEFT': -1, 'RIGHT': 1}[action]
+        new_state = list(state)
+        new_state[blank], new_state[neighbor] = new_state[neighbor], new_state[blank]
+        return tuple(new_state)
+
+    def check_solvability(self, state):
+        """ Checks if the given state can reach the standard goal (blank last). On boards
+        of even width the row of the blank changes the parity of the inversions. """
+        inversion = 0
+        tiles = [t for t in state if t != 0]
+        for i in range(len(tiles)):
+            for j in range(i + 1, len(tiles)):
+                if tiles[i] > tiles[j]:
+                    inversion += 1
+        if self.n % 2:
+            return inversion % 2 == 0
+        return (inversion + state.index(0) // self.n) % 2 == 1
+
+    def misplaced_tiles(self, node):
+        """ The number of tiles (not counting the blank) out of place. """
+        return sum(s != g for (s, g) in zip(node.state, self.goal) if s != 0)
+
+    def manhattan(self, node):
+        """ The sum of the Manhattan distances of the tiles from their goal squares. """
+        n, goal_positions = self.n, self.goal_positions
+        total = 0
+        for i, tile in enumerate(node.state):
+            if tile != 0:
+                g = goal_positions[tile]
+                total += abs(i // n - g // n) + abs(i % n - g % n)
+        return total
+
+    def h(self, node):
+        """ The Manhattan distance heuristic. """
+        return self.manhattan(node)
+
+
+class PatternDatabase:
+    """For a pattern (a subset of the tiles) of the N x N sliding-tile puzzle,
+    the exact number of moves of pattern tiles needed to bring them to their
+    goal squares, for every placement of the pattern tiles. Moves of the
+    other tiles are free, so the costs of disjoint patterns can be added and
+    still give an admissible heuristic. The table is a uint8 NumPy array
+    indexed by the squares of the pattern tiles, sum(square_i * (N*N)**i),
+    built once by a breadth-first search backward from the goal; it can be
+    saved with np.save and memory-mapped on load so processes share it."""
+
+    def __init__(self, n, tiles, goal=None, table=None):
+        self.n = n
+        self.tiles = tuple(tiles)
+        self.goal = goal or tuple(range(1, n * n)) + (0,)
+        self.table = self.build() if table is None else table
+
+    def build(self):
+        """Search backward from the goal over (pattern squares, blank square),
+        with 0-1 BFS: moving the blank onto a pattern tile costs 1, onto any
+        other tile 0. The cost of a placement is its minimum over the blank."""
+        n2, k = self.n * self.n, len(self.tiles)
+        neighbors = [[j for j in (i - self.n, i + self.n) if 0 <= j < n2]
+                     + [j for j in (i - 1, i + 1) if 0 <= j < n2 and j // self.n == i // self.n]
+                     for i in range(n2)]
+        weights = [n2 ** i for i in range(k)]
+        cost = np.full(n2 ** (k + 1), 255, dtype=np.uint8)
+        start = tuple(self.goal.index(t) for t in self.tiles)
+        blank = self.goal.index(0)
+        cost[sum(p * w for p, w in zip(start, weights)) + blank * n2 ** k] = 0
+        queue = deque([(start, blank, 0)])
+        while queue:
+            squares, blank, c = queue.popleft()
+            base = sum(p * w for p, w in zip(squares, weights))
+            if cost[base + blank * n2 ** k] < c:
+                continue
+            for square in neighbors[blank]:
+                if square in squares:
+                    i = squares.index(square)
+                    moved = squares[:i] + (blank,) + squares[i + 1:]
+                    index = base + (blank - square) * weights[i] + square * n2 ** k
+                    if c + 1 < cost[index]:
+                        cost[index] = c + 1
+                        queue.append((moved, square, c + 1))
+                else:
+                    index = base + square * n2 ** k
+                    if c < cost[index]:
+                        cost[index] = c
+                        queue.appendleft((squares, square, c))
+        return cost.reshape(n2, -1).min(axis=0)
+
+    def filename(self):
+        """A file name that identifies the pattern and the goal squares of its tiles."""
+        return 'pdb{}x{}_{}.npy'.format(self.n, self.n, '_'.join(
+            '{}at{}'.format(t, self.goal.index(t)) for t in self.tiles))
+
+    def save(self, directory='.'):
+        np.save(os.path.join(directory, self.filename()), np.asarray(self.table))
+
+    @classmethod
+    def load(cls, n, tiles, goal=None, directory='.', mmap_mode='r'):
+        """Load a saved database, memory-mapped read-only by default."""
+        pdb = cls.__new__(cls)
+        pdb.n, pdb.tiles, pdb.goal = n, tuple(tiles), goal or tuple(range(1, n * n)) + (0,)
+        pdb.table = np.load(os.path.join(directory, pdb.filename()), mmap_mode=mmap_mode)
+        return pdb
+
+    def cost(self, squares):
+        """The cost for a state, given squares[tile] = the square of tile."""
+        n2, index = self.n * self.n, 0
+        for tile in reversed(self.tiles):
+            index = index * n2 + squares[tile]
+        return int(self.table[index])
+
+
+def default_partition(n):
+    """Split the tiles of the N x N puzzle into groups small enough to build:
+    4 for the 8-puzzle, 5 for the 15-puzzle and 4 for the 24-puzzle."""
+    size = 5 if n == 4 else 4
+    tiles = list(range(1, n * n))
+    return [tuple(tiles[i:i + size]) for i in range(0, len(tiles), size)]
+
+
+class AdditivePatternDatabase:
+    """An admissible heuristic for SlidingTilePuzzle: the sum of the costs in
+    the PatternDatabases of a partition of the tiles into disjoint patterns.
+    If directory is given, databases saved there are memory-mapped, and the
+    ones missing are built and saved. Use it as astar_search(problem, h=pdb)."""
+
+    def __init__(self, n, partition=None, goal=None, directory=None):
+        self.n = n
+        self.databases = []
+        for tiles in partition or default_partition(n):
+            try:
+                if directory is None:
+                    raise FileNotFoundError
+                pdb = PatternDatabase.load(n, tiles, goal, directory)
+            except FileNotFoundError:
+                pdb = PatternDatabase(n, tiles, goal)
+                if directory is not None:
+                    pdb.save(directory)
+            self.databases.append(pdb)
+
+    def __call__(self, node):
+        squares = [0] * (self.n * self.n)
+        for i, tile in enumerate(node.state):
+            squares[tile] = i
+        return sum(pdb.cost(squares) for pdb in self.databases)
+
+
 # ______________________________________________________________________________
 
 
@@ -600,13 +1853,15 @@ class PlanRoute(Problem):
 # Other search algorithms
 
 
-def recursive_best_first_search(problem, h=None):
+def recursive_best_first_search(problem, h=None, budget=None):
     """[Figure 3.26]"""
     h = memoize(h or problem.h, 'h')
 
     def RBFS(problem, node, flimit):
         if problem.goal_test(node.state):
             return node, 0  # (The second value is immaterial)
+        if budget is not None and budget.charge(node, node.depth):
+            return budget.exceeded(), np.inf
         successors = node.expand(problem)
         if len(successors) == 0:
             return None, np.inf
@@ -626,19 +1881,169 @@ def recursive_best_first_search(problem, h=None):
             if result is not None:
                 return result, best.f
 
-    node = Node(problem.initial)
+    node = root_node(problem)
     node.f = h(node)
     result, bestf = RBFS(problem, node, np.inf)
     return result
 
 
+def iterative_deepening_astar_search(problem, h=None, budget=None):
+    """IDA*: depth-first search cut off where f = g + h exceeds a bound,
+    restarted with the bound raised to the smallest f that exceeded it.
+    Memory is linear in the solution depth. The depth-first search uses an
+    explicit stack instead of recursion, so deep problems cannot hit
+    Python's recursion limit, and it never revisits a state already on
+    the current path."""
+    h = memoize(h or problem.h, 'h')
+    root = root_node(problem)
+    if problem.goal_test(root.state):
+        return root
+    bound = h(root)
+    while bound < np.inf:
+        next_bound = np.inf
+        on_path = {root.state}
+        stack = [(root, iter(root.expand(problem)))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node.state)
+                continue
+            if child.state in on_path:
+                continue
+            f = child.path_cost + h(child)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if problem.goal_test(child.state):
+                return child
+            if budget is not None and budget.charge(child, len(stack)):
+                return budget.exceeded()
+            on_path.add(child.state)
+            stack.append((child, iter(child.expand(problem))))
+        bound = next_bound
+    return None
+
+
+class SMANode:
+    """An entry of the tree kept in memory by simplified_memory_bounded_astar_search.
+    pending holds the actions not generated yet, children the successors in
+    memory and forgotten the backed-up f values of dropped successors."""
+
+    def __init__(self, node, f, parent=None, actions=()):
+        self.node = node
+        self.f = f
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.pending = list(actions)
+        self.children = {}
+        self.forgotten = {}
+
+
+def simplified_memory_bounded_astar_search(problem, h=None, max_nodes=1000, budget=None):
+    """SMA*: A* that keeps at most max_nodes nodes in memory. Successors
+    are generated one at a time; when memory is full the shallowest leaf
+    with the highest f is dropped and its f is remembered by its parent,
+    which will regenerate it if the rest of its subtree looks worse. The
+    solution is optimal if the optimal path fits in memory (its depth is
+    less than max_nodes), else the best reachable one is returned."""
+    h = h or problem.h
+    counter = itertools.count()
+    order = {}
+    root = SMANode(root_node(problem), 0, actions=problem.actions(problem.initial))
+    root.f = h(root.node)
+    # best: lowest f, deepest first. worst: highest f, shallowest first.
+    best = IndexedPriorityQueue('min', lambda e: (e.f, -e.depth, order[e]))
+    worst = IndexedPriorityQueue('min', lambda e: (-e.f, e.depth, order[e]))
+
+    def enqueue(entry):
+        order[entry] = next(counter)
+        best.append(entry)
+        if not entry.children:
+            worst.append(entry)
+
+    def rescore(entry):
+        if entry in best:
+            best.decrease_key(entry)
+        if entry in worst:
+            worst.decrease_key(entry)
+
+    def backup(entry):
+        """Back up the f values of entry's successors into entry and its ancestors."""
+        while entry is not None and not entry.pending:
+            fs = [c.f for c in entry.children.values()] + list(entry.forgotten.values())
+            new_f = min(fs) if fs else np.inf
+            if new_f == entry.f:
+                break
+            entry.f = new_f
+            rescore(entry)
+            entry = entry.parent
+
+    def on_path(entry, state):
+        while entry is not None:
+            if entry.node.state == state:
+                return True
+            entry = entry.parent
+        return False
+
+    enqueue(root)
+    used = 1
+    while best:
+        entry = best.peek()
+        if entry.f == np.inf:
+            return None
+        if problem.goal_test(entry.node.state):
+            return entry.node
+        if budget is not None and budget.charge(entry.node, used):
+            return budget.exceeded()
+
+        # Generate the next successor: a new action, or the most promising forgotten one.
+        if entry.pending:
+            action = entry.pending.pop(0)
+            floor = entry.f
+        else:
+            action = min(entry.forgotten, key=entry.forgotten.get)
+            floor = max(entry.f, entry.forgotten.pop(action))
+        child = entry.node.child_node(problem, action)
+        successor = SMANode(child, 0, entry, problem.actions(child.state))
+        if on_path(entry, child.state) or (successor.depth >= max_nodes - 1
+                                           and not problem.goal_test(child.state)):
+            successor.f = np.inf
+        else:
+            successor.f = max(floor, child.path_cost + h(child))
+        entry.children[action] = successor
+        if entry in worst:
+            del worst[entry]
+        if not entry.pending and not entry.forgotten:
+            del best[entry]
+        backup(entry)
+
+        used += 1
+        if used > max_nodes and worst:
+            dropped = worst.pop()
+            del best[dropped]
+            parent = dropped.parent
+            action = first(a for a, c in parent.children.items() if c is dropped)
+            del parent.children[action]
+            parent.forgotten[action] = dropped.f
+            if parent not in best:
+                order[parent] = next(counter)
+                best.append(parent)
+            if not parent.children:
+                worst.append(parent)
+            used -= 1
+        enqueue(successor)
+    return None
+
+
 def hill_climbing(problem):
     """
     [Figure 4.2]
     From the initial node, keep choosing the neighbor with highest value,
     stopping when no neighbor is better.
     """
-    current = Node(problem.initial)
+    current = root_node(problem)
     while True:
         neighbors = current.expand(problem)
         if not neighbors:
@@ -658,7 +2063,7 @@ def exp_schedule(k=20, lam=0.005, limit=100):
 def simulated_annealing(problem, schedule=exp_schedule()):
     """[Figure 4.5] CAUTION: This differs from the pseudocode as it
     returns a state instead of a Node."""
-    current = Node(problem.initial)
+    current = root_node(problem)
     for t in range(sys.maxsize):
         T = schedule(t)
         if T == 0:
@@ -676,7 +2081,7 @@ def simulated_annealing_full(problem, schedule=exp_schedule()):
     """ This version returns all the states encountered in reaching 
     the goal state."""
     states = []
-    current = Node(problem.initial)
+    current = root_node(problem)
     for t in range(sys.maxsize):
         states.append(current.state)
         T = schedule(t)
@@ -691,7 +2096,7 @@ def simulated_annealing_full(problem, schedule=exp_schedule()):
             current = next_choice
 
 
-def and_or_graph_search(problem):
+def and_or_graph_search(problem, budget=None):
     """[Figure 4.11]Used when the environment is nondeterministic and completely observable.
     Contains OR nodes where the agent is free to choose any action.
     After every action there is an AND node which contains all possible states
@@ -699,7 +2104,9 @@ def and_or_graph_search(problem):
     The agent must be able to handle all possible states of the AND node (as it
     may end up in any of them).
     Returns a conditional plan to reach goal state,
-    or failure if the former is not possible."""
+    or failure if the former is not possible.
+    A SearchBudget is charged for each OR node expanded, with the length of
+    the path to it as the frontier size."""
 
     # functions used by and_or_search
     def or_search(state, problem, path):
@@ -708,6 +2115,8 @@ def and_or_graph_search(problem):
             return []
         if state in path:
             return None
+        if budget is not None and (budget.reason or budget.charge(Node(state), len(path))):
+            return None
         for action in problem.actions(state):
             plan = and_search(problem.result(state, action),
                               problem, path + [state, ])
@@ -724,7 +2133,10 @@ def and_or_graph_search(problem):
         return plan
 
     # body of and or search
-    return or_search(problem.initial, problem, [])
+    plan = or_search(problem.initial, problem, [])
+    if plan is None and budget is not None and budget.reason:
+        return budget.exceeded()
+    return plan
 
 
 # Pre-defined actions for PeakFindingProblem
@@ -1057,12 +2469,319 @@ class Graph:
         nodes = s1.union(s2)
         return list(nodes)
 
+    def neighbors(self, a):
+        """Return a list of the nodes that a links to."""
+        return list(self.get(a))
+
+    def node_index(self):
+        """Return a dict numbering the nodes 0..n-1, in order of str(node);
+        the node numbers used by the arrays of dijkstra and DistanceTable."""
+        return {node: i for i, node in enumerate(sorted(self.nodes(), key=str))}
+
+    def reversed(self):
+        """Return a Graph with every link of this one turned around, and the
+        same locations if it has any (this graph itself if it is undirected)."""
+        if not self.directed:
+            return self
+        graph = Graph()
+        for a, links in self.graph_dict.items():
+            for b, dist in links.items():
+                graph.connect1(b, a, dist)
+        if hasattr(self, 'locations'):
+            graph.locations = self.locations
+        return graph
+
+    def dijkstra(self, source, index=None):
+        """Single-source shortest paths by Dijkstra's algorithm on a binary
+        heap; link lengths must be non-negative. Returns two NumPy arrays over
+        the nodes numbered by index (a {node: i} dict, node_index() by
+        default): dist[i] is the distance from source to node i, np.inf if it
+        cannot be reached, and pred[i] the number of the node before i on a
+        shortest path, -1 for source and unreached nodes."""
+        index = index or self.node_index()
+        nodes = list(index)
+        dist = np.full(len(nodes), np.inf)
+        pred = np.full(len(nodes), -1, dtype=np.int32 if len(nodes) < 2 ** 31 else np.int64)
+        s = index[source]
+        dist[s] = 0
+        frontier = [(0, s)]
+        while frontier:
+            d, i = heapq.heappop(frontier)
+            if d > dist[i]:
+                continue
+            for neighbor, length in self.graph_dict.get(nodes[i], {}).items():
+                j = index[neighbor]
+                if d + length < dist[j]:
+                    dist[j] = d + length
+                    pred[j] = i
+                    heapq.heappush(frontier, (d + length, j))
+        return dist, pred
+
+    def all_pairs_shortest_paths(self, sources=None, processes=None):
+        """Run dijkstra from every node (or just from sources) and return the
+        results as a DistanceTable. With processes > 1 the sources are split
+        among a pool of that many processes, each sent one copy of the graph.
+        The table takes 12 bytes per (source, node) pair."""
+        index = self.node_index()
+        sources = list(index) if sources is None else list(sources)
+        if processes and processes > 1 and len(sources) > 1:
+            size = -(-len(sources) // processes)
+            chunks = [sources[i:i + size] for i in range(0, len(sources), size)]
+            with multiprocessing.Pool(len(chunks)) as pool:
+                parts = pool.starmap(shortest_path_rows, [(self, chunk, index) for chunk in chunks])
+        else:
+            parts = [shortest_path_rows(self, sources, index)]
+        return DistanceTable(list(index), sources, np.concatenate([dist for dist, _ in parts]),
+                             np.concatenate([pred for _, pred in parts]))
+
 
 def UndirectedGraph(graph_dict=None):
     """Build a Graph where every edge (including future ones) goes both ways."""
     return Graph(graph_dict=graph_dict, directed=False)
 
 
+def shortest_path_rows(graph, sources, index):
+    """Return the dist and pred arrays of graph.dijkstra for each of sources,
+    stacked one row per source; the job of one process of
+    Graph.all_pairs_shortest_paths."""
+    rows = [graph.dijkstra(source, index) for source in sources]
+    n = len(index)
+    dtype = np.int32 if n < 2 ** 31 else np.int64
+    return (np.array([dist for dist, _ in rows]).reshape(len(rows), n),
+            np.array([pred for _, pred in rows], dtype=dtype).reshape(len(rows), n))
+
+
+class DistanceTable:
+    """Exact shortest distances and paths from a set of source nodes to every
+    node of a Graph, as made by Graph.all_pairs_shortest_paths: dist[r, i] is
+    the distance from sources[r] to nodes[i] and pred[r, i] the number of the
+    node before nodes[i] on a shortest path from sources[r] (-1 if none).
+    It answers distance and path queries by lookup, and attach(problem) makes
+    the exact distance to the goal the h of a GraphProblem, so that A* only
+    expands nodes on shortest paths; that needs every node as a source."""
+
+    def __init__(self, nodes, sources, dist, pred):
+        self.nodes, self.sources = nodes, sources
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.row = {source: r for r, source in enumerate(sources)}
+        self.dist, self.pred = dist, pred
+
+    def distance(self, a, b):
+        """The length of a shortest path from source a to b (np.inf if none)."""
+        return self.dist[self.row[a], self.index[b]]
+
+    def path(self, a, b):
+        """The list of nodes on a shortest path from source a to b, or None."""
+        if self.distance(a, b) == np.inf:
+            return None
+        pred, i = self.pred[self.row[a]], self.index[b]
+        path = [b]
+        while pred[i] >= 0:
+            i = pred[i]
+            path.append(self.nodes[i])
+        return path[::-1]
+
+    def attach(self, problem):
+        """Use the exact distances as the h of problem; returns self."""
+        problem.h = BoundHeuristic(self, problem)
+        problem.h_batch = BoundHeuristic(self, problem, True)
+        return self
+
+    def heuristic(self, problem, node, inner=None):
+        return self.distance(node.state, problem.goal)
+
+    def heuristic_batch(self, problem, states, inner=None):
+        return self.dist[[self.row[state] for state in states], self.index[problem.goal]].tolist()
+
+    def nbytes(self):
+        """The memory taken by the dist and pred arrays, in bytes."""
+        return self.dist.nbytes + self.pred.nbytes
+
+
+class CSRGraph:
+    """A frozen Graph in compressed sparse row form: the nodes are numbered
+    0..n-1, names[i] is the name of node i, the links out of node i go to
+    the node numbers targets[offsets[i]:offsets[i+1]] with the lengths at the
+    same positions of weights, all NumPy arrays. That takes a few bytes per
+    edge instead of a dict entry, and loads from a file without rebuilding
+    any Python dicts. It has the get, neighbors and nodes methods of Graph,
+    and graph.locations if coordinates are given, so a GraphProblem can
+    search it unchanged. Build one with CSRGraph.from_graph(graph); save
+    writes an .npz file, or a directory of .npy files that load memory-mapped.
+    graph_dict rebuilds the dict of dicts, for code that needs it."""
+
+    def __init__(self, names, offsets, targets, weights, directed=True, coordinates=None):
+        self.names = names
+        self.name_list = names.tolist()
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.directed = bool(directed)
+        self.coordinates = coordinates
+        self.node_index = None
+        self.location_dict = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        names = sorted(graph.nodes(), key=str)
+        index = {name: i for i, name in enumerate(names)}
+        offsets, targets, weights = [0], [], []
+        for name in names:
+            links = graph.graph_dict.get(name, {})
+            targets.extend(index[b] for b in links)
+            weights.extend(links.values())
+            offsets.append(len(targets))
+        if all(isinstance(name, str) for name in names):
+            name_array = np.array(names, dtype=str)
+        elif all(isinstance(name, int) for name in names):
+            name_array = np.array(names, dtype=np.int64)
+        else:
+            name_array = np.empty(len(names), dtype=object)
+            name_array[:] = names
+        integral = all(isinstance(w, (int, np.integer)) for w in weights)
+        locations = getattr(graph, 'locations', None)
+        coordinates = None
+        if locations and all(name in locations for name in names):
+            coordinates = np.array([locations[name] for name in names], dtype=float)
+        return cls(name_array, np.array(offsets, dtype=np.int64),
+                   np.array(targets, dtype=np.int32 if len(names) < 2 ** 31 else np.int64),
+                   np.array(weights, dtype=np.int64 if integral else float), graph.directed,
+                   coordinates)
+
+    @property
+    def index(self):
+        """The dict from node name to node number, built on first use."""
+        if self.node_index is None:
+            self.node_index = {name: i for i, name in enumerate(self.name_list)}
+        return self.node_index
+
+    @property
+    def locations(self):
+        if self.location_dict is None and self.coordinates is not None:
+            self.location_dict = dict(zip(self.name_list, map(tuple, self.coordinates.tolist())))
+        return self.location_dict
+
+    def neighbors(self, a):
+        """Return a list of the nodes that a links to."""
+        i = self.index.get(a)
+        if i is None:
+            return []
+        names = self.name_list
+        return [names[j] for j in self.targets[self.offsets[i]:self.offsets[i + 1]].tolist()]
+
+    def get(self, a, b=None):
+        """As Graph.get: the length of the link from a to b, or None;
+        or a dict of {node: length} of the links out of a."""
+        i = self.index.get(a)
+        if i is None:
+            return {} if b is None else None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        targets = self.targets[lo:hi].tolist()
+        if b is None:
+            return dict(zip([self.name_list[j] for j in targets], self.weights[lo:hi].tolist()))
+        j = self.index.get(b)
+        if j not in targets:
+            return None
+        return self.weights[lo + targets.index(j)].item()
+
+    def nodes(self):
+        """Return a list of nodes in the graph."""
+        return list(self.name_list)
+
+    @property
+    def graph_dict(self):
+        return {name: self.get(name) for name in self.name_list}
+
+    def nbytes(self):
+        """The memory taken by the arrays, in bytes (not counting names)."""
+        return self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes
+
+    def arrays(self):
+        arrays = dict(names=self.names, offsets=self.offsets, targets=self.targets,
+                      weights=self.weights, directed=np.array(self.directed))
+        if self.coordinates is not None:
+            arrays['coordinates'] = self.coordinates
+        return arrays
+
+    def save(self, path):
+        """Save to path: an .npz file if path ends in '.npz', else a
+        directory of .npy files, which load can memory-map."""
+        arrays = self.arrays()
+        if path.endswith('.npz'):
+            np.savez(path, **arrays)
+        else:
+            os.makedirs(path, exist_ok=True)
+            for name, values in arrays.items():
+                np.save(os.path.join(path, name + '.npy'), values)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a CSRGraph saved at path; the arrays in a directory are
+        memory-mapped with mmap_mode (not the names, nor an .npz)."""
+        if path.endswith('.npz'):
+            with np.load(path, allow_pickle=True) as data:
+                arrays = {name: data[name] for name in data.files}
+        else:
+            arrays = {}
+            for file in os.listdir(path):
+                name = file[:-len('.npy')]
+                mode = None if name in ('names', 'directed') else mmap_mode
+                arrays[name] = np.load(os.path.join(path, file), mmap_mode=mode, allow_pickle=True)
+        return cls(arrays['names'], arrays['offsets'], arrays['targets'], arrays['weights'],
+                   arrays['directed'].item(), arrays.get('coordinates'))
+
+
+class GridIndex:
+    """A grid-bucket spatial index of the locations of nodes, for nearest
+    neighbour queries: the plane is cut into square cells holding about one
+    node each, and a query looks at rings of cells around its point, nearest
+    first, until no unexamined cell can hold anything closer. That makes a
+    query O(1) on average for evenly spread nodes, instead of a scan of all
+    of them. Ties in distance go to the node earliest in nodes."""
+
+    def __init__(self, locations, nodes, cell_size=None):
+        xs = [locations[node][0] for node in nodes]
+        ys = [locations[node][1] for node in nodes]
+        area = (max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1) if nodes else 1
+        self.cell_size = cell_size or max(area / max(len(nodes), 1), 1e-12) ** 0.5
+        self.cells = collections.defaultdict(list)
+        for i, (node, x, y) in enumerate(zip(nodes, xs, ys)):
+            self.cells[self.cell(x, y)].append((i, node, x, y))
+        cells = list(self.cells) or [(0, 0)]
+        self.bounds = (min(c[0] for c in cells), max(c[0] for c in cells),
+                       min(c[1] for c in cells), max(c[1] for c in cells))
+        self.rings = [[(0, 0)]]
+
+    def cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def ring(self, r):
+        """The offsets of the cells at Chebyshev distance r from a cell."""
+        while len(self.rings) <= r:
+            k = len(self.rings)
+            offsets = [(dx, dy) for dx in range(-k, k + 1) for dy in (-k, k)]
+            offsets.extend((dx, dy) for dx in (-k, k) for dy in range(-k + 1, k))
+            self.rings.append(offsets)
+        return self.rings[r]
+
+    def nearest(self, point, exclude=lambda node: False):
+        """Return the node nearest to point for which exclude(node) is false, or None."""
+        px, py = point
+        cx, cy = self.cell(px, py)
+        x0, x1, y0, y1 = self.bounds
+        cells, size = self.cells, self.cell_size
+        best, best_key = None, None
+        for r in range(max(cx - x0, x1 - cx, cy - y0, y1 - cy) + 1):
+            for dx, dy in self.ring(r):
+                for i, node, x, y in cells.get((cx + dx, cy + dy), ()):
+                    key = ((x - px) ** 2 + (y - py) ** 2, i)
+                    if (best_key is None or key < best_key) and not exclude(node):
+                        best, best_key = node, key
+            if best_key is not None and best_key[0] <= (r * size) ** 2:
+                break
+        return best
+
+
 def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
                 curvature=lambda: random.uniform(1.1, 1.5)):
     """Construct a random graph, with the specified nodes, and random links.
@@ -1070,24 +2789,24 @@ def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
     Then each node is connected to the min_links nearest neighbors.
     Because inverse links are added, some nodes will have more connections.
     The distance between nodes is the hypotenuse times curvature(),
-    where curvature() defaults to a random number between 1.1 and 1.5."""
+    where curvature() defaults to a random number between 1.1 and 1.5.
+    Nearest neighbors are found with a GridIndex, so a graph of 10**6 nodes
+    takes minutes rather than forever."""
     g = UndirectedGraph()
     g.locations = {}
     # Build the cities
     for node in nodes:
         g.locations[node] = (random.randrange(width), random.randrange(height))
+    index = GridIndex(g.locations, nodes)
     # Build roads from each city to at least min_links nearest neighbors.
     for i in range(min_links):
         for node in nodes:
-            if len(g.get(node)) < min_links:
+            links = g.get(node)
+            if len(links) < min_links:
                 here = g.locations[node]
-
-                def distance_to_node(n):
-                    if n is node or g.get(node, n):
-                        return np.inf
-                    return distance(g.locations[n], here)
-
-                neighbor = min(nodes, key=distance_to_node)
+                neighbor = index.nearest(here, lambda n: n is node or links.get(n))
+                if neighbor is None:
+                    continue
                 d = distance(g.locations[neighbor], here) * curvature()
                 g.connect(node, neighbor, int(d))
     return g
@@ -1176,6 +2895,21 @@ australia_map.locations = dict(WA=(120, 24), NT=(135, 20), SA=(135, 30),
                                V=(145, 37))
 
 
+def location_table(graph):
+    """Return (locations, index, coords) for graph.locations: index maps each
+    node to its row in coords, a NumPy array of the coordinates. It is built
+    once per graph and kept on the graph, until graph.locations is replaced
+    or changes size; None if the graph has no locations."""
+    locs = getattr(graph, 'locations', None)
+    if not locs:
+        return None
+    table = getattr(graph, 'location_rows', None)
+    if table is None or table[0] is not locs or len(table[1]) != len(locs):
+        index = {node: i for i, node in enumerate(locs)}
+        table = graph.location_rows = (locs, index, np.array(list(locs.values()), dtype=float))
+    return table
+
+
 class GraphProblem(Problem):
     """The problem of searching a graph from one node to another."""
 
@@ -1185,7 +2919,7 @@ class GraphProblem(Problem):
 
     def actions(self, A):
         """The actions at a graph node are just its neighbors."""
-        return list(self.graph.get(A).keys())
+        return self.graph.neighbors(A)
 
     def result(self, state, action):
         """The result of going to a neighbor is just that neighbor."""
@@ -1214,6 +2948,398 @@ class GraphProblem(Problem):
         else:
             return np.inf
 
+    def h_batch(self, states):
+        """Return the list of h values of states, as straight-line distances
+        computed in one vectorized call on the rows of states in the
+        coordinate array of the graph (see location_table). astar_search
+        uses this with batch=True to score all the children of an expansion
+        at once, unless h is replaced in a subclass or on the instance (see
+        batch_heuristic)."""
+        table = location_table(self.graph)
+        if table is None:
+            return [np.inf] * len(states)
+        _, index, coords = table
+        delta = coords[[index[state] for state in states]] - coords[index[self.goal]]
+        return np.hypot(delta[:, 0], delta[:, 1]).astype(int).tolist()
+
+
+class Landmarks:
+    """ALT (A*, Landmarks, Triangle inequality) preprocessing of a Graph for
+    many point-to-point GraphProblem queries [Goldberg and Harrelson, 2005].
+    For each of k landmarks L the shortest distances from L to every node and
+    from every node to L are found with Dijkstra's algorithm, and kept as
+    float32 NumPy arrays with one row per landmark (the same array twice for
+    an undirected graph). By the triangle inequality the distance from v to a
+    goal t is at least d(L, t) - d(L, v) and d(v, L) - d(t, L) for every L,
+    so their maximum is an admissible and consistent h that needs no
+    graph.locations and sees around detours. Unless landmarks are given they
+    are picked farthest-first, each as far as possible from those before.
+    attach(problem) makes it the h (and h_batch) of a GraphProblem, for
+    whatever goal the problem has when searched. Integer distances are exact
+    in float32 up to 2**24."""
+
+    def __init__(self, graph, k=8, landmarks=None):
+        self.graph = graph
+        self.index = graph.node_index()
+        self.nodes = list(self.index)
+        self.reverse = graph.reversed()
+        self.landmarks = list(landmarks) if landmarks is not None else self.farthest_landmarks(k)
+        self.from_landmark = np.array([self.distances(L) for L in self.landmarks], dtype=np.float32)
+        if graph.directed:
+            self.to_landmark = np.array([self.distances(L, reverse=True) for L in self.landmarks],
+                                        dtype=np.float32)
+        else:
+            self.to_landmark = self.from_landmark
+        self.goal, self.columns = None, None
+
+    def distances(self, source, reverse=False):
+        """Return the array of shortest distances from source to each node (to
+        source from each node if reverse), np.inf for those not connected."""
+        return (self.reverse if reverse else self.graph).dijkstra(source, self.index)[0]
+
+    def farthest_landmarks(self, k):
+        """Pick k landmarks farthest-first, starting from the node farthest
+        from the first node; a node another landmark cannot reach counts as
+        infinitely far, so every component gets a landmark before any gets two."""
+        k = min(k, len(self.nodes))
+        nearest = self.distances(self.nodes[0])
+        landmarks = []
+        while len(landmarks) < k:
+            landmark = self.nodes[int(np.argmax(nearest))]
+            landmarks.append(landmark)
+            nearest = np.minimum(nearest, self.distances(landmark))
+            nearest[[self.index[L] for L in landmarks]] = -1
+        return landmarks
+
+    def goal_columns(self, goal):
+        """Return the lists of the distances from each landmark to goal and
+        from goal to each landmark, kept until the goal changes."""
+        if goal != self.goal:
+            t = self.index[goal]
+            self.goal = goal
+            self.columns = (self.from_landmark[:, t].tolist(), self.to_landmark[:, t].tolist())
+        return self.columns
+
+    def h_value(self, state, goal):
+        """The landmark lower bound on the distance from state to goal, in
+        O(k) from the column of state; np.inf if goal cannot be reached."""
+        from_goal, to_goal = self.goal_columns(goal)
+        v = self.index[state]
+        h = 0
+        for at_goal, at_state in zip(from_goal, self.from_landmark[:, v].tolist()):
+            if at_goal - at_state > h:
+                h = at_goal - at_state
+        for at_state, at_goal in zip(self.to_landmark[:, v].tolist(), to_goal):
+            if at_state - at_goal > h:
+                h = at_state - at_goal
+        return h
+
+    def attach(self, problem):
+        """Use the landmark heuristic for problem; returns self."""
+        problem.h = BoundHeuristic(self, problem)
+        problem.h_batch = BoundHeuristic(self, problem, True)
+        return self
+
+    def heuristic(self, problem, node, inner=None):
+        return self.h_value(node.state, problem.goal)
+
+    def heuristic_batch(self, problem, states, inner=None):
+        """The h values of states, from their columns of the landmark arrays."""
+        rows, t = [self.index[state] for state in states], self.index[problem.goal]
+        with np.errstate(invalid='ignore'):
+            bounds = np.concatenate([self.from_landmark[:, t, None] - self.from_landmark[:, rows],
+                                     self.to_landmark[:, rows] - self.to_landmark[:, t, None]])
+        return np.fmax(np.fmax.reduce(bounds, axis=0), 0).tolist()
+
+    def nbytes(self):
+        """The memory taken by the distance arrays, in bytes."""
+        if self.to_landmark is self.from_landmark:
+            return self.from_landmark.nbytes
+        return self.from_landmark.nbytes + self.to_landmark.nbytes
+
+
+class ContractionHierarchy:
+    """A contraction hierarchy [Geisberger et al., 2008] of a static Graph, for
+    answering many shortest-path queries fast. Nodes are contracted one at a
+    time, least important first (by edge difference, the shortcuts it needs
+    minus the edges it removes, plus its contracted neighbors, updated
+    lazily). Contracting v adds a shortcut u->w of length d(u, v) + d(v, w)
+    wherever a bounded witness search finds no path from u to w as short
+    that avoids v. A query is then a bidirectional Dijkstra that only goes up
+    the hierarchy, from the source along edges to later contracted nodes, and
+    from the target along such edges backwards; it settles a few hundred
+    nodes even on large graphs. query returns a Node path in the format of
+    astar_search on a GraphProblem, with the shortcuts unpacked. Save and
+    load it with save and ContractionHierarchy.load."""
+
+    def __init__(self, graph, witness_limit=50):
+        self.graph = graph
+        self.witness_limit = witness_limit
+        self.rank = {}
+        self.up = collections.defaultdict(dict)
+        self.down = collections.defaultdict(dict)
+        self.middle = {}
+        self.shortcuts = 0
+        self.build()
+
+    def build(self):
+        out, into = collections.defaultdict(dict), collections.defaultdict(dict)
+        for a, links in self.graph.graph_dict.items():
+            for b, dist in links.items():
+                if a != b and dist < out[a].get(b, np.inf):
+                    out[a][b] = into[b][a] = dist
+        nodes = self.graph.nodes()
+        contracted = collections.Counter()
+        queue = [(self.priority(v, out, into, contracted), i, v) for i, v in enumerate(nodes)]
+        heapq.heapify(queue)
+        while queue:
+            _, i, v = heapq.heappop(queue)
+            priority = self.priority(v, out, into, contracted)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, i, v))
+                continue
+            for u, w, dist in self.witness_shortcuts(v, out, into):
+                if dist < out[u].get(w, np.inf):
+                    out[u][w] = into[w][u] = dist
+                    self.middle[u, w] = v
+                    self.shortcuts += 1
+            self.rank[v] = len(self.rank)
+            self.up[v] = out.pop(v, {})
+            self.down[v] = into.pop(v, {})
+            for w in self.up[v]:
+                del into[w][v]
+                contracted[w] += 1
+            for u in self.down[v]:
+                del out[u][v]
+                contracted[u] += 1
+
+    def priority(self, v, out, into, contracted):
+        """The edge difference of contracting v, plus its contracted neighbors."""
+        return (len(self.witness_shortcuts(v, out, into)) - len(out[v]) - len(into[v])
+                + contracted[v])
+
+    def witness_shortcuts(self, v, out, into):
+        """The shortcuts (u, w, length) needed to contract v: those u->v->w
+        paths for which a Dijkstra search from u avoiding v, settling at most
+        witness_limit nodes, finds nothing as short."""
+        shortcuts = []
+        for u, to_v in into[v].items():
+            targets = {w: to_v + dist for w, dist in out[v].items() if w != u}
+            if not targets:
+                continue
+            bound = max(targets.values())
+            found = {u: 0}
+            frontier = [(0, u)]
+            settled = 0
+            while frontier and settled < self.witness_limit:
+                d, x = heapq.heappop(frontier)
+                if d > found[x]:
+                    continue
+                if d > bound:
+                    break
+                settled += 1
+                for y, dist in out[x].items():
+                    if y != v and d + dist < found.get(y, np.inf):
+                        found[y] = d + dist
+                        heapq.heappush(frontier, (d + dist, y))
+            shortcuts.extend((u, w, via) for w, via in targets.items()
+                             if found.get(w, np.inf) > via)
+        return shortcuts
+
+    def query(self, source, target):
+        """Return the Node at target of a shortest path from source, or None."""
+        if source == target:
+            return Node(source)
+        dist = ({source: 0}, {target: 0})
+        parent = ({source: None}, {target: None})
+        frontiers = ([(0, source)], [(0, target)])
+        links = (self.up, self.down)
+        best, meet = np.inf, None
+        while frontiers[0] or frontiers[1]:
+            forward, backward = frontiers
+            side = 1 if backward and (not forward or backward[0] < forward[0]) else 0
+            d, x = heapq.heappop(frontiers[side])
+            if d >= best:
+                break
+            if d > dist[side][x]:
+                continue
+            if x in dist[1 - side] and d + dist[1 - side][x] < best:
+                best, meet = d + dist[1 - side][x], x
+            for y, length in links[side][x].items():
+                if d + length < dist[side].get(y, np.inf):
+                    dist[side][y] = d + length
+                    parent[side][y] = x
+                    heapq.heappush(frontiers[side], (d + length, y))
+        if meet is None:
+            return None
+        path, x = [], meet
+        while x is not None:
+            path.append(x)
+            x = parent[0][x]
+        path.reverse()
+        x = parent[1][meet]
+        while x is not None:
+            path.append(x)
+            x = parent[1][x]
+        node = Node(source)
+        for a, b in zip(path, path[1:]):
+            for state in self.unpack(a, b):
+                node = Node(state, node, state, node.path_cost + self.graph.get(node.state, state))
+        return node
+
+    def unpack(self, a, b):
+        """The nodes after a on the original path that the edge a->b stands for."""
+        nodes, stack = [], [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            if (a, b) in self.middle:
+                v = self.middle[a, b]
+                stack.append((v, b))
+                stack.append((a, v))
+            else:
+                nodes.append(b)
+        return nodes
+
+    def search(self, problem):
+        """Solve a GraphProblem on this graph, as astar_search would."""
+        return self.query(problem.initial, problem.goal)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+class DStarLite:
+    """D* Lite [Koenig and Likhachev, 2002]: incremental replanning of a
+    GraphProblem whose link lengths change. It searches backwards from the
+    goal, keeping g (the distance to the goal) and rhs (its one-step
+    lookahead) for every node it touched, so after update_edge only the
+    nodes whose distances the change affects are expanded again, instead of
+    running astar_search from scratch. Call search() for the current
+    shortest path as a Node, update_edge(A, B, cost) for each change (an
+    infinite cost blocks the link) and move_to(state) as the agent follows
+    the path; search() again repairs the path. h(a, b) must be an admissible
+    estimate of the distance between any two nodes; by default the
+    straight-line distance if the graph has locations, else 0. update_edge
+    changes the graph of the problem itself. expansions counts the nodes
+    expanded so far. search(budget) charges each expansion to a SearchBudget
+    and returns a BudgetExceeded if it runs out; the work done is kept, so
+    a later search() carries on from there."""
+
+    def __init__(self, problem, h=None):
+        self.problem = problem
+        self.graph = problem.graph
+        self.reverse = self.graph.reversed()
+        self.h = h or self.straight_line
+        self.start = self.last = problem.initial
+        self.goal = problem.goal
+        self.km = 0
+        self.g, self.rhs = {}, {self.goal: 0}
+        self.queue = IndexedPriorityQueue('min', self.key)
+        self.queue.append(self.goal)
+        self.expansions = 0
+
+    def straight_line(self, a, b):
+        locs = getattr(self.graph, 'locations', None)
+        return int(distance(locs[a], locs[b])) if locs else 0
+
+    def key(self, s):
+        g = min(self.g.get(s, np.inf), self.rhs.get(s, np.inf))
+        return g + self.h(self.start, s) + self.km, g
+
+    def predecessors(self, s):
+        """The nodes with a link into s; for an undirected graph these are the
+        actions of the problem, so an InstrumentedProblem counts expansions."""
+        if self.graph.directed:
+            return list(self.reverse.graph_dict.get(s, {}))
+        return self.problem.actions(s)
+
+    def cost(self, a, b):
+        """The length of the link from a to b, as the problem counts it."""
+        return self.problem.path_cost(0, a, b, b)
+
+    def lookahead(self, s):
+        """The best distance to the goal through one of the links out of s."""
+        return min((self.cost(s, t) + self.g.get(t, np.inf)
+                    for t in self.graph.graph_dict.get(s, {})), default=np.inf)
+
+    def update_vertex(self, s):
+        if s != self.goal:
+            self.rhs[s] = self.lookahead(s)
+        if s in self.queue:
+            del self.queue[s]
+        if self.g.get(s, np.inf) != self.rhs.get(s, np.inf):
+            self.queue.append(s)
+
+    def compute_shortest_path(self, budget=None):
+        """Expand nodes until the start is consistent; return False if the
+        budget ran out first."""
+        queue = self.queue
+        start = self.start
+        while queue.heap and (queue.heap[0][0] < self.key(start)
+                              or self.rhs.get(start, np.inf) != self.g.get(start, np.inf)):
+            old_key, u = queue.heap[0]
+            if old_key < self.key(u):
+                queue.decrease_key(u)
+                continue
+            if budget is not None and budget.charge(Node(u), len(queue)):
+                return False
+            self.expansions += 1
+            del queue[u]
+            if self.g.get(u, np.inf) > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for s in self.predecessors(u):
+                    self.update_vertex(s)
+            else:
+                self.g[u] = np.inf
+                for s in self.predecessors(u) + [u]:
+                    self.update_vertex(s)
+        return True
+
+    def search(self, budget=None):
+        """Return the Node at the goal of a shortest path from the current
+        start, as astar_search would, or None if the goal cannot be reached."""
+        if not self.compute_shortest_path(budget):
+            return budget.exceeded()
+        if self.g.get(self.start, np.inf) == np.inf:
+            return None
+        node = Node(self.start)
+        for _ in range(len(self.g)):
+            if node.state == self.goal:
+                return node
+            state = min(self.graph.graph_dict.get(node.state, {}),
+                        key=lambda t: (self.cost(node.state, t) + self.g.get(t, np.inf), str(t)))
+            node = Node(state, node, state,
+                        self.problem.path_cost(node.path_cost, node.state, state, state))
+        return None
+
+    def update_edge(self, A, B, cost):
+        """Set the length of the link from A to B (both ways if the graph is
+        undirected) to cost; the next search() repairs the path."""
+        self.graph.connect(A, B, cost)
+        if self.graph.directed:
+            self.reverse.connect1(B, A, cost)
+            self.update_vertex(A)
+        else:
+            self.update_vertex(A)
+            self.update_vertex(B)
+
+    def move_to(self, state):
+        """Make state the new start, as the agent moves along the path."""
+        self.start = state
+        self.km += self.h(self.last, state)
+        self.last = state
+
+
+def dstar_lite_search(problem, h=None, budget=None):
+    """Solve a GraphProblem with a new DStarLite; see that class for replanning."""
+    return DStarLite(problem, h).search(budget)
+
 
 class GraphProblemStochastic(GraphProblem):
     """
@@ -1544,6 +3670,8 @@ class InstrumentedProblem(Problem):
         return self.problem.value(state)
 
     def __getattr__(self, attr):
+        if attr == 'problem':  # not set yet, while copying or unpickling
+            raise AttributeError(attr)
         return getattr(self.problem, attr)
 
     def __repr__(self):
@@ -1567,10 +3695,472 @@ def compare_searchers(problems, header,
     print_table(table, header)
 
 
-def compare_graph_searchers():
-    """Prints a table of search results."""
-    compare_searchers(problems=[GraphProblem('Arad', 'Bucharest', romania_map),
-                                GraphProblem('Oradea', 'Neamt', romania_map),
-                                GraphProblem('Q', 'WA', australia_map)],
-                      header=['Searcher', 'romania_map(Arad, Bucharest)',
-                              'romania_map(Oradea, Neamt)', 'australia_map'])
+BENCHMARK_FIELDS = ['searcher', 'problem', 'status', 'cost', 'expansions', 'goal_tests', 'states',
+                    'wall', 'cpu', 'peak_kb', 'expansions_per_sec']
+
+
+def benchmark_cell(searcher, problem):
+    """Run searcher on problem in this process and return a dict of measurements:
+    the status ('solved', 'failed', 'not a goal' for a local search that stopped
+    elsewhere, or the error), solution cost, the counters of
+    InstrumentedProblem, wall-clock and CPU seconds, peak traced memory in KB,
+    expansions per second, and the states on the solution path. Memory
+    tracing slows the search down somewhat."""
+    p = InstrumentedProblem(problem)
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        node = searcher(p)
+        if not node:
+            status = 'failed'
+        else:
+            status = 'solved' if problem.goal_test(node.state) else 'not a goal'
+    except Exception as e:
+        node, status = None, 'error: {!r}'.format(e)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(status=status, cost=node.path_cost if node else None, expansions=p.succs,
+                goal_tests=p.goal_tests, states=p.states, wall=wall, cpu=cpu, peak_kb=peak // 1024,
+                expansions_per_sec=p.succs / wall if wall else None,
+                path=[n.state for n in node.path()] if node else None)
+
+
+def start_worker(target, *args):
+    """Start target(connection, *args) in a daemon process, and return the
+    receiving end of the one-way pipe to connection, and the process."""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=target, args=(sender,) + args, daemon=True)
+    process.start()
+    sender.close()
+    return receiver, process
+
+
+def benchmark_worker(connection, searcher, problem):
+    connection.send(benchmark_cell(searcher, problem))
+    connection.close()
+
+
+def benchmark_searchers(problems, searchers=(breadth_first_tree_search, breadth_first_graph_search,
+                                             depth_first_graph_search, iterative_deepening_search,
+                                             depth_limited_search, recursive_best_first_search),
+                        labels=None, timeout=60, processes=None, path=None):
+    """Run every searcher on every problem, each (searcher, problem) cell in its
+    own process, at most processes (default: the CPU count) at a time. A cell
+    still running after timeout seconds is killed and has status 'timeout'.
+    Returns one dict per cell with the BENCHMARK_FIELDS and the solution
+    'path'; if path is given, they are also written to it as CSV (without
+    the solution paths), or as JSON if path ends in '.json'.
+    Searchers and problems must be picklable where processes are spawned."""
+    labels = labels or ['{}->{}'.format(p.initial, p.goal) for p in problems]
+    cells = [(searcher, problem) for searcher in searchers for problem in problems]
+    results = [None] * len(cells)
+    pending = deque(range(len(cells)))
+    running = {}
+    processes = processes or os.cpu_count() or 1
+    while pending or running:
+        while pending and len(running) < processes:
+            i = pending.popleft()
+            receiver, process = start_worker(benchmark_worker, *cells[i])
+            running[receiver] = (i, process, time.monotonic())
+        ready = multiprocessing.connection.wait(list(running), timeout=0.05)
+        for receiver, (i, process, start) in list(running.items()):
+            if receiver in ready:
+                try:
+                    results[i] = receiver.recv()
+                except EOFError:
+                    results[i] = dict(status='crashed', wall=time.monotonic() - start)
+            elif timeout is not None and time.monotonic() - start > timeout:
+                process.terminate()
+                results[i] = dict(status='timeout', wall=time.monotonic() - start)
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[receiver]
+    rows = [dict({field: None for field in BENCHMARK_FIELDS}, searcher=name(searcher),
+                 problem=label, **result)
+            for (searcher, _), label, result in zip(cells, labels * len(searchers), results)]
+    if path:
+        write_benchmark(rows, path)
+    return rows
+
+
+def write_benchmark(rows, path):
+    """Write the rows of benchmark_searchers to path, as JSON if it ends in '.json', else CSV."""
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.json'):
+            json.dump(rows, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, BENCHMARK_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def print_benchmark(rows):
+    """Print the rows of benchmark_searchers as a table."""
+    print_table([[round(row[field], 4) if isinstance(row[field], float) else row[field]
+                  for field in BENCHMARK_FIELDS] for row in rows], BENCHMARK_FIELDS)
+
+
+def compare_graph_searchers(timeout=60, path=None):
+    """Prints a table of search results, running the searchers in parallel."""
+    print_benchmark(benchmark_searchers(problems=[GraphProblem('Arad', 'Bucharest', romania_map),
+                                                  GraphProblem('Oradea', 'Neamt', romania_map),
+                                                  GraphProblem('Q', 'WA', australia_map)],
+                                        labels=['romania_map(Arad, Bucharest)',
+                                                'romania_map(Oradea, Neamt)', 'australia_map'],
+                                        timeout=timeout, path=path))
+
+
+def portfolio_worker(connection, searcher, problem):
+    node = searcher(problem)
+    connection.send([(n.state, n.action, n.path_cost) for n in node.path()] if node else None)
+    connection.close()
+
+
+def node_from_path(path):
+    """Rebuild a solution Node from the (state, action, path_cost) of each node on its path."""
+    node = None
+    for state, action, path_cost in path:
+        node = Node(state, node, action, path_cost)
+    return node
+
+
+def portfolio_search(problem, searchers=(astar_search, breadth_first_graph_search,
+                                         depth_first_graph_search, recursive_best_first_search),
+                     cost_bound=None, timeout=None):
+    """Race the searchers on problem, each in its own process, and return the
+    name of the first one to find a solution with path_cost <= cost_bound (any
+    solution if cost_bound is None) together with that solution; the other
+    processes are then killed. Returns (None, None) if no searcher finds one
+    within timeout seconds. The solution is sent back as its path, so it is a
+    fresh chain of Nodes. Searchers and problem must be picklable where
+    processes are spawned."""
+    running = {}
+    for searcher in searchers:
+        receiver, process = start_worker(portfolio_worker, searcher, problem)
+        running[receiver] = (searcher, process)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    winner = (None, None)
+    try:
+        while running and winner[1] is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            for receiver in multiprocessing.connection.wait(list(running), timeout=remaining):
+                searcher, process = running.pop(receiver)
+                try:
+                    path = receiver.recv()
+                except EOFError:
+                    path = None
+                receiver.close()
+                process.join()
+                if path and (cost_bound is None or path[-1][2] <= cost_bound):
+                    winner = (name(searcher), node_from_path(path))
+                    break
+    finally:
+        for receiver, (_, process) in running.items():
+            process.terminate()
+            process.join()
+            receiver.close()
+    return winner
+
+
+def state_owner(state, processes):
+    """The worker that owns state in hash_distributed_astar_search. It hashes
+    repr(state), not hash(state), which is salted differently per process."""
+    return zlib.crc32(repr(state).encode()) % processes
+
+
+def hda_worker(w, problem, h, inboxes, replies, lock, sent, received, idle, bound, goal_owner,
+               expansions, batch_size):
+    """One worker of hash_distributed_astar_search: A* on the states it owns,
+    sending the children it does not own to their owners in batches."""
+    inbox, processes = inboxes[w], len(inboxes)
+    frontier, order = [], itertools.count()
+    g_cost, parent = {}, {}
+    outboxes = [[] for _ in range(processes)]
+    goal = None
+    expanded = 0
+
+    def add(state, g, from_state, action):
+        if g < g_cost.get(state, np.inf):
+            g_cost[state], parent[state] = g, (from_state, action)
+            f = g + h(Node(state, None, None, g))
+            if f < bound.value:
+                heapq.heappush(frontier, (f, -g, next(order), state))
+
+    def flush():
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                with lock:
+                    sent.value += 1
+                inboxes[owner].put(('batch', batch))
+                outboxes[owner] = []
+
+    def handle(message):
+        if message[0] == 'batch':
+            for item in message[1]:
+                add(*item)
+        elif message[0] == 'goal':
+            replies.put((goal,) + parent[goal] + (g_cost[goal],))
+        elif message[0] == 'trace':
+            replies.put((message[1],) + parent[message[1]] + (g_cost[message[1]],))
+        return message[0] != 'stop'
+
+    def receive(message):
+        if message[0] == 'batch':
+            with lock:
+                received.value += 1
+                idle[w] = 0
+        return handle(message)
+
+    while True:
+        while not inbox.empty():
+            if not receive(inbox.get()):
+                return
+        while frontier and frontier[0][0] >= bound.value:
+            heapq.heappop(frontier)
+        if not frontier:
+            flush()
+            with lock:
+                idle[w] = 1
+                expansions[w] = expanded
+            if not receive(inbox.get()):
+                return
+            continue
+        f, g, _, state = heapq.heappop(frontier)
+        if -g > g_cost[state]:
+            continue
+        if problem.goal_test(state):
+            with lock:
+                if -g < bound.value:
+                    bound.value, goal_owner.value, goal = -g, w, state
+            continue
+        expanded += 1
+        for action in problem.actions(state):
+            child = problem.result(state, action)
+            child_g = problem.path_cost(-g, state, action, child)
+            owner = state_owner(child, processes)
+            if owner == w:
+                add(child, child_g, state, action)
+            else:
+                outboxes[owner].append((child, child_g, state, action))
+                if len(outboxes[owner]) >= batch_size:
+                    flush()
+        if expanded % batch_size == 0:
+            flush()
+            expansions[w] = expanded
+
+
+def hash_distributed_astar_search(problem, h=None, processes=None, batch_size=64, stats=None,
+                                  budget=None):
+    """Hash-distributed A* (HDA*): each state is owned by one of processes
+    workers, picked by state_owner, which keeps its g cost, parent and place in
+    the frontier; generated children are sent to their owners in batches of up
+    to batch_size through queues. The cost of the best goal found so far is
+    shared, and nodes whose f is not below it are pruned. The search ends when
+    every worker is idle and every batch sent has been received, which makes
+    the best goal optimal for an admissible h. The path is then traced back by
+    asking the owner of each state for its parent. The problem and h must be
+    picklable where processes are spawned. If stats is a dict, the number of
+    expansions of each worker is stored in stats['expansions']. A SearchBudget
+    is checked by the coordinating process as it polls the workers, which
+    report their expansions every batch_size of them, so each may overrun
+    max_expansions by up to a batch; budget.best is not kept."""
+    h = h or problem.h
+    processes = processes or os.cpu_count() or 1
+    inboxes = [multiprocessing.Queue() for _ in range(processes)]
+    replies = multiprocessing.Queue()
+    lock = multiprocessing.Lock()
+    sent = multiprocessing.Value('q', 1, lock=False)
+    received = multiprocessing.Value('q', 0, lock=False)
+    idle = multiprocessing.Array('b', processes, lock=False)
+    bound = multiprocessing.Value('d', np.inf, lock=False)
+    goal_owner = multiprocessing.Value('i', -1, lock=False)
+    expansions = multiprocessing.Array('q', processes, lock=False)
+    workers = [multiprocessing.Process(target=hda_worker, daemon=True,
+                                       args=(w, problem, h, inboxes, replies, lock, sent, received,
+                                             idle, bound, goal_owner, expansions, batch_size))
+               for w in range(processes)]
+    for worker in workers:
+        worker.start()
+    root = (problem.initial, 0, None, None)
+    inboxes[state_owner(problem.initial, processes)].put(('batch', [root]))
+    counted = 0
+    try:
+        while True:
+            with lock:
+                if all(idle) and sent.value == received.value:
+                    break
+            if not all(worker.is_alive() for worker in workers):
+                raise RuntimeError('a hash_distributed_astar_search worker died')
+            if budget is not None:
+                total = sum(expansions)
+                budget.expansions += total - counted
+                counted = total
+                if budget.exhausted():
+                    if stats is not None:
+                        stats['expansions'] = list(expansions)
+                    return budget.exceeded()
+            time.sleep(0.001)
+        if budget is not None:
+            budget.expansions += sum(expansions) - counted
+        if stats is not None:
+            stats['expansions'] = list(expansions)
+        if goal_owner.value < 0:
+            return None
+        inboxes[goal_owner.value].put(('goal',))
+        path = [replies.get()]
+        while path[-1][1] is not None:
+            inboxes[state_owner(path[-1][1], processes)].put(('trace', path[-1][1]))
+            path.append(replies.get())
+        return node_from_path([(state, action, g) for state, _, action, g in reversed(path)])
+    finally:
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+
+
+def compare_memory_bounded_searchers(problems=None, max_nodes=500):
+    """Prints, for astar_search and the memory-bounded searchers, the number
+    of expansions, wall-clock seconds and peak traced memory (in KB) on each
+    problem, to choose a memory/time tradeoff per workload."""
+    def sma(problem):
+        return simplified_memory_bounded_astar_search(problem, max_nodes=max_nodes)
+
+    sma.__name__ = 'sma_star({})'.format(max_nodes)
+    if problems is None:
+        problems = [GraphProblem('Arad', 'Bucharest', romania_map),
+                    GraphProblem('Oradea', 'Neamt', romania_map),
+                    EightPuzzle((1, 2, 3, 4, 5, 7, 8, 6, 0)),
+                    EightPuzzle((2, 4, 3, 1, 5, 6, 7, 8, 0))]
+    searchers = [astar_search, recursive_best_first_search, iterative_deepening_astar_search, sma]
+    table = []
+    for searcher in searchers:
+        for problem in problems:
+            p = InstrumentedProblem(problem)
+            tracemalloc.start()
+            start = time.perf_counter()
+            node = searcher(p)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            table.append([name(searcher), '{}->{}'.format(problem.initial, problem.goal), p.succs,
+                          node.path_cost if node else None, '{:.4f}'.format(seconds), peak // 1024])
+    print_table(table, ['Searcher', 'Problem', 'Expansions', 'Cost', 'Seconds', 'Peak KB'])
+
+
+def compare_sliding_tile_heuristics(n=3, instances=5, scramble=60, pdb=None, seed=None):
+    """Prints the A* expansions and seconds of the misplaced-tiles, Manhattan
+    and additive pattern-database heuristics on random N x N puzzles made by
+    scramble random moves from the goal. Building the databases for N > 3
+    takes minutes, so pass an AdditivePatternDatabase loaded from disk."""
+    rng = random.Random(seed)
+    pdb = pdb or AdditivePatternDatabase(n)
+    goal = SlidingTilePuzzle(tuple(range(1, n * n)) + (0,))
+    table = []
+    for _ in range(instances):
+        state = goal.initial
+        for _ in range(scramble):
+            state = goal.result(state, rng.choice(goal.actions(state)))
+        problem = SlidingTilePuzzle(state)
+        heuristics = [('misplaced', problem.misplaced_tiles), ('manhattan', problem.manhattan),
+                      ('pdb', pdb)]
+        for label, h in heuristics:
+            p = InstrumentedProblem(problem)
+            start = time.perf_counter()
+            node = astar_search(p, h=h)
+            seconds = time.perf_counter() - start
+            table.append([label, state, p.succs, node.path_cost, '{:.4f}'.format(seconds)])
+    print_table(table, ['Heuristic', 'Initial', 'Expansions', 'Cost', 'Seconds'])
+
+
+def compare_hash_distributed_astar(problem=None, h=None, max_processes=None):
+    """Prints the expansions, cost, seconds and speedup over one worker of
+    hash_distributed_astar_search with 1, 2, 4, ... up to max_processes
+    (default: the CPU count) workers."""
+    problem = problem or EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    max_processes = max_processes or os.cpu_count() or 1
+    counts = sorted({min(2 ** i, max_processes) for i in range(max_processes.bit_length() + 1)})
+    table = []
+    for processes in counts:
+        stats = {}
+        start = time.perf_counter()
+        node = hash_distributed_astar_search(problem, h, processes, stats=stats)
+        seconds = time.perf_counter() - start
+        table.append([processes, sum(stats['expansions']), node.path_cost, round(seconds, 3),
+                      round(table[0][3] / seconds if table else 1.0, 2)])
+    print_table(table, ['Processes', 'Expansions', 'Cost', 'Seconds', 'Speedup'])
+
+
+def compare_contraction_hierarchy(sizes=(10 ** 3, 10 ** 4), queries=100, seed=None):
+    """Prints, for a RandomGraph of each size, the time to build its
+    ContractionHierarchy and the mean milliseconds per random query of
+    astar_search and of the hierarchy. Sizes up to 10**6 work, but take
+    many minutes to build, and A* takes seconds per query on them."""
+    rng = random.Random(seed)
+    table = []
+    for n in sizes:
+        side = 10 * int(n ** 0.5)
+        graph = RandomGraph(list(range(n)), min_links=3, width=side, height=side)
+        start = time.perf_counter()
+        hierarchy = ContractionHierarchy(graph)
+        build = time.perf_counter() - start
+        pairs = [rng.sample(range(n), 2) for _ in range(queries)]
+        start = time.perf_counter()
+        for a, b in pairs:
+            astar_search(GraphProblem(a, b, graph))
+        astar_ms = (time.perf_counter() - start) * 1000 / queries
+        start = time.perf_counter()
+        for a, b in pairs:
+            hierarchy.query(a, b)
+        ch_ms = (time.perf_counter() - start) * 1000 / queries
+        table.append([n, hierarchy.shortcuts, round(build, 2), round(astar_ms, 3), round(ch_ms, 3),
+                      round(astar_ms / ch_ms, 1)])
+    print_table(table, ['Nodes', 'Shortcuts', 'Build s', 'A* ms', 'CH ms', 'Speedup'])
+
+
+def compare_dstar_lite(n=1000, changes=(1, 10, 100), rounds=20, seed=None):
+    """Prints, for each number of changes, the mean expansions per replanning
+    of astar_search from scratch and of DStarLite on a RandomGraph of n
+    nodes. In each round the agent moves one step along its path and that
+    many random links get a random length between their original length
+    and three times it (so straight-line distance stays admissible)."""
+    rng = random.Random(seed)
+    table = []
+    for k in changes:
+        random.seed(rng.random())
+        side = 10 * int(n ** 0.5)
+        graph = RandomGraph(list(range(n)), min_links=3, width=side, height=side)
+        original = {(a, b): d for a, links in graph.graph_dict.items()
+                    for b, d in links.items() if a < b}
+        edges = list(original)
+        start, goal = rng.sample(range(n), 2)
+        dstar = DStarLite(GraphProblem(start, goal, graph))
+        node = dstar.search()
+        astar_expansions = dstar_expansions = replans = 0
+        for _ in range(rounds):
+            if node is None or node.state == dstar.start or len(node.path()) < 2:
+                break
+            dstar.move_to(node.path()[1].state)
+            for a, b in rng.sample(edges, min(k, len(edges))):
+                dstar.update_edge(a, b, int(original[a, b] * rng.uniform(1, 3)))
+            before = dstar.expansions
+            node = dstar.search()
+            dstar_expansions += dstar.expansions - before
+            problem = InstrumentedProblem(GraphProblem(dstar.start, goal, graph))
+            replanned = astar_search(problem)
+            assert (node and node.path_cost) == (replanned and replanned.path_cost)
+            astar_expansions += problem.succs
+            replans += 1
+        if replans:
+            table.append([n, k, replans, round(astar_expansions / replans, 1),
+                          round(dstar_expansions / replans, 1),
+                          round(astar_expansions / max(dstar_expansions, 1), 1)])
+    print_table(table, ['Nodes', 'Changes', 'Replans', 'A* expansions', 'D* Lite expansions',
+                        'Ratio'])
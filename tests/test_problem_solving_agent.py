@@ -0,0 +1,40 @@
+import pickle
+
+import pytest
+import search
+from ProblemSolvingAgent import *
+from search import romania_map
+
+
+def test_euclidean_distances():
+    locations = romania_map.locations
+    dense = EuclideanDistances(locations)
+    lazy = EuclideanDistances(locations, dense_limit=0, max_columns=2)
+    assert dense.matrix is not None and lazy.matrix is None
+    for a in locations:
+        for b in ['Bucharest', 'Arad', 'Neamt']:
+            expected = np.linalg.norm(np.subtract(locations[a], locations[b]))
+            assert dense(a, b) == pytest.approx(expected) and lazy(a, b) == pytest.approx(expected)
+    assert list(lazy.columns) == ['Arad', 'Neamt']
+    assert EuclideanDistances(CustomGraph().locations).matrix.shape == (100, 100)
+
+
+def test_parallel_solver():
+    psa = ProblemSolvingAgent('Arad', 'Bucharest', romania_map)
+    solvers = psa.solvers()
+    assert [search.name(solver) for solver in solvers] == [
+        "Depth First Search", "Breadth First Search", "Greedy Best-First Search", "A* Search", "D* Search",
+        "Hill Climbing Search", "Simulated Annealing Search"]
+    assert search.name(search.astar_search) == 'astar_search'
+    assert search.name(search.depth_first_graph_search) == 'depth_first_graph_search'
+    pickle.dumps((solvers, psa.problem))
+    report = psa.parallel_solver(timeout=60)
+    rows = {row['searcher']: row for row in report}
+    for solver in ["A* Search", "D* Search"]:
+        assert rows[solver]['status'] == 'solved' and rows[solver]['cost'] == 418
+        assert rows[solver]['path'] == ['Arad', 'Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert rows["Breadth First Search"]['status'] == 'solved'
+
+
+if __name__ == '__main__':
+    pytest.main()
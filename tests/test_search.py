@@ -15,6 +15,22 @@ def test_find_min_edge():
     assert romania_problem.find_min_edge() == 70
 
 
+def test_frontiers():
+    nodes = [Node(s) for s in 'ABC']
+    fifo, lifo = FIFOFrontier(nodes), LIFOFrontier(nodes)
+    assert Node('B') in fifo and Node('D') not in fifo
+    assert fifo.pop().state == 'A' and lifo.pop().state == 'C'
+    assert Node('A') not in fifo and len(fifo) == 2
+    assert fifo.max_size == 3
+
+    frontier = PriorityFrontier(lambda n: n.path_cost, [Node('A', path_cost=5), Node('B', path_cost=3)])
+    assert frontier[Node('A')] == 5
+    frontier.decrease_key(Node('A', path_cost=1))
+    assert frontier.pop().path_cost == 1
+    del frontier[Node('B')]
+    assert Node('B') not in frontier and len(frontier) == 0
+
+
 def test_breadth_first_tree_search():
     assert breadth_first_tree_search(
         romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
@@ -61,6 +77,23 @@ def test_iterative_deepening_search():
         romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
 
 
+def test_iterative_deepening_search_with_transposition_table():
+    assert iterative_deepening_search(
+        romania_problem, table_size=100).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    problem = InstrumentedProblem(eight_puzzle)
+    assert len(iterative_deepening_search(problem, table_size=1000).solution()) == 12
+    assert problem.succs < 5000
+
+
+def test_transposition_table():
+    table = TranspositionTable(maxsize=2)
+    assert table.visit('A', 3)
+    assert not table.visit('A', 3)
+    assert table.visit('A', 1)
+    assert table.visit('B', 2) and table.visit('C', 2)
+    assert len(table) == 2 and table.visit('A', 5)
+
+
 def test_depth_limited_search():
     solution_3 = depth_limited_search(romania_problem, 3).solution()
     assert solution_3[-1] == 'Bucharest'
@@ -70,9 +103,20 @@ def test_depth_limited_search():
 
 
 def test_bidirectional_search():
-    assert bidirectional_search(romania_problem) == 418
-    assert bidirectional_search(eight_puzzle) == 12
-    assert bidirectional_search(EightPuzzle((1, 2, 3, 4, 5, 6, 0, 7, 8))) == 2
+    node = bidirectional_search(romania_problem)
+    assert node.path_cost == 418
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert bidirectional_search(eight_puzzle).path_cost == 12
+    assert bidirectional_search(EightPuzzle((1, 2, 3, 4, 5, 6, 0, 7, 8))).solution() == ['RIGHT', 'RIGHT']
+    assert bidirectional_search(GraphProblem('Arad', 'Arad', romania_map)).solution() == []
+    cycle = Graph(dict(A=dict(B=1), B=dict(C=1), C=dict(D=1), D=dict(A=1)))
+    assert bidirectional_search(GraphProblem('A', 'C', cycle)).solution() == ['B', 'C']
+    assert bidirectional_search(GraphProblem('C', 'B', cycle)).solution() == ['D', 'A', 'B']
+    with pytest.raises(ValueError):
+        bidirectional_search(GraphProblem('A', 'C', CSRGraph.from_graph(cycle)))
+    problem, budget = InstrumentedProblem(eight_puzzle), SearchBudget()
+    assert bidirectional_search(problem, budget).path_cost == 12
+    assert problem.succs >= budget.expansions
 
 
 def test_astar_search():
@@ -83,6 +127,307 @@ def test_astar_search():
     assert astar_search(n_queens).solution() == [7, 1, 3, 0, 6, 4, 2, 5]
 
 
+def test_search_events():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    events = SearchEvents().attach(problem)
+    assert astar_search(problem).path_cost == 418
+    trace = events.drain()
+    assert trace[:2] == [('expand', 'Arad', 0), ('generate', 'Zerind', 75)]
+    assert trace[-1] == ('goal', 'Bucharest', None)
+    assert [kind for kind, _, _ in trace].count('expand') == 5
+    assert ('prune', 'Arad', None) in trace and events.drain() == []
+    batches = []
+    events = SearchEvents(batches.append, batch_size=10)
+    events.attach(problem)
+    breadth_first_graph_search(problem)
+    assert [len(batch) for batch in batches] == [10, 10, 8]
+    events.detach(problem)
+    assert type(astar_search(problem)) is Node and not hasattr(problem, 'events')
+
+
+def test_grid_index():
+    locations = {'A': (0, 0), 'B': (3, 0), 'C': (0, 3), 'D': (10, 10), 'E': (1, 1)}
+    index = GridIndex(locations, list(locations))
+    assert index.nearest((0, 0)) == 'A'
+    assert index.nearest((0, 0), lambda n: n in 'AE') == 'B'
+    assert index.nearest((9, 2)) == 'B' and index.nearest((20, 20)) == 'D'
+    assert index.nearest((0, 0), lambda n: True) is None
+    graph = RandomGraph(list(range(500)), min_links=3, width=200, height=200)
+    assert all(graph.get(node) for node in range(500))
+    nearest = min((n for n in range(1, 500)), key=lambda n: (distance(graph.locations[n], graph.locations[0]), n))
+    assert GridIndex(graph.locations, list(range(500))).nearest(graph.locations[0], lambda n: n == 0) == nearest
+    small = RandomGraph([0, 1, 2], min_links=4)
+    assert all(node not in small.get(node) and len(small.get(node)) == 2 for node in range(3))
+
+
+def test_csr_graph(tmpdir):
+    csr = CSRGraph.from_graph(romania_map)
+    assert csr.get('Arad') == {'Zerind': 75, 'Sibiu': 140, 'Timisoara': 118}
+    assert csr.get('Arad', 'Sibiu') == 140 and csr.get('Arad', 'Neamt') is None
+    assert sorted(csr.neighbors('Arad')) == ['Sibiu', 'Timisoara', 'Zerind']
+    assert len(csr.targets) == 46 and csr.nbytes() == 21 * 8 + 46 * (4 + 8)
+    assert astar_search(GraphProblem('Arad', 'Bucharest', csr)).solution() == ['Sibiu', 'Rimnicu', 'Pitesti',
+                                                                               'Bucharest']
+    for path in [str(tmpdir.join('romania.npz')), str(tmpdir.join('romania'))]:
+        csr.save(path)
+        loaded = CSRGraph.load(path)
+        assert loaded.get('Arad') == csr.get('Arad') and loaded.locations == csr.locations
+        assert uniform_cost_search(GraphProblem('Oradea', 'Neamt', loaded)).path_cost == 835
+    assert isinstance(loaded.targets, np.memmap)
+    grid = CSRGraph.from_graph(UndirectedGraph({(0, 0): {(0, 1): 1.5}}))
+    assert grid.nodes() == [(0, 0), (0, 1)] and grid.get((0, 1), (0, 0)) == 1.5
+
+
+def test_shortest_paths():
+    dist, pred = romania_map.dijkstra('Arad')
+    index = romania_map.node_index()
+    assert dist[index['Bucharest']] == 418 and dist[index['Arad']] == 0 and pred[index['Arad']] == -1
+    assert list(index)[pred[index['Bucharest']]] == 'Pitesti'
+    table = romania_map.all_pairs_shortest_paths()
+    assert table.dist.shape == table.pred.shape == (20, 20) and table.nbytes() == 20 * 20 * 12
+    for a, b in [('Oradea', 'Neamt'), ('Arad', 'Bucharest'), ('Eforie', 'Timisoara')]:
+        node = uniform_cost_search(GraphProblem(a, b, romania_map))
+        assert table.distance(a, b) == node.path_cost and table.path(a, b) == [n.state for n in node.path()]
+    split = romania_map.all_pairs_shortest_paths(processes=3)
+    assert np.array_equal(split.dist, table.dist) and np.array_equal(split.pred, table.pred)
+    problem = GraphProblem('Oradea', 'Neamt', romania_map)
+    table.attach(problem)
+    exact = InstrumentedProblem(problem)
+    assert astar_search(exact).path_cost == 835 and exact.succs == len(table.path('Oradea', 'Neamt')) - 1
+    directed = Graph(dict(A=dict(B=1, C=4), B=dict(C=1, D=5), C=dict(D=1)))
+    table = directed.all_pairs_shortest_paths(sources=['A', 'C'])
+    assert table.path('A', 'D') == ['A', 'B', 'C', 'D'] and table.distance('C', 'A') == np.inf
+    assert table.path('C', 'A') is None
+    assert table.heuristic_batch(GraphProblem('A', 'D', directed), ['A', 'C']) == [3, 1]
+    assert directed.reversed().get('D') == dict(B=5, C=1)
+
+
+def test_dstar_lite():
+    graph = copy.deepcopy(romania_map)
+    dstar = DStarLite(GraphProblem('Arad', 'Bucharest', graph))
+    node = dstar.search()
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest'] and node.path_cost == 418
+    expansions = dstar.expansions
+    dstar.update_edge('Pitesti', 'Bucharest', 500)
+    node = dstar.search()
+    assert node.solution() == ['Sibiu', 'Fagaras', 'Bucharest'] and node.path_cost == 450
+    assert dstar.expansions - expansions < expansions * 3
+    dstar.move_to('Sibiu')
+    dstar.update_edge('Sibiu', 'Fagaras', np.inf)
+    assert dstar.search().solution() == ['Rimnicu', 'Pitesti', 'Bucharest']
+    assert dstar.search().path_cost == uniform_cost_search(GraphProblem('Sibiu', 'Bucharest', graph)).path_cost
+    directed = Graph(dict(A=dict(B=1, C=4), B=dict(C=1, D=5), C=dict(D=1)))
+    dstar = DStarLite(GraphProblem('A', 'D', directed))
+    assert dstar.search().solution() == ['B', 'C', 'D']
+    dstar.update_edge('B', 'C', 9)
+    assert dstar.search().solution() == ['C', 'D'] and dstar.search().path_cost == 5
+    dstar.update_edge('A', 'C', np.inf)
+    assert dstar.search().solution() == ['B', 'D'] and dstar.search().path_cost == 6
+    dstar.update_edge('B', 'D', np.inf)
+    assert dstar.search().solution() == ['B', 'C', 'D'] and dstar.search().path_cost == 11
+    dstar.update_edge('B', 'C', np.inf)
+    assert dstar.search() is None
+    assert dstar_lite_search(GraphProblem('Oradea', 'Neamt', romania_map)).path_cost == 835
+
+
+def test_bidirectional_search_attached_heuristic():
+    landmarks, table = Landmarks(romania_map, k=4), romania_map.all_pairs_shortest_paths()
+    for a, b in [('Eforie', 'Timisoara'), ('Arad', 'Iasi')]:
+        for attach in [landmarks.attach, table.attach, lambda p: HeuristicCache().attach(p)]:
+            problem = GraphProblem(a, b, romania_map)
+            attach(problem)
+            assert bidirectional_search(problem).path_cost == table.distance(a, b)
+            assert bidirectional_search(InstrumentedProblem(problem)).path_cost == table.distance(a, b)
+    problem = GraphProblem('Eforie', 'Timisoara', romania_map)
+    problem.h = lambda node: 0
+    assert bidirectional_search(problem).path_cost == 805
+
+
+def test_landmarks():
+    landmarks = Landmarks(romania_map, k=4)
+    assert landmarks.landmarks == ['Neamt', 'Eforie', 'Drobeta', 'Giurgiu']
+    assert landmarks.from_landmark.dtype == np.float32 and landmarks.nbytes() == 4 * 20 * 4
+    plain = InstrumentedProblem(GraphProblem('Oradea', 'Neamt', romania_map))
+    problem = GraphProblem('Oradea', 'Neamt', romania_map)
+    landmarks.attach(problem)
+    alt = InstrumentedProblem(problem)
+    assert astar_search(alt).path_cost == astar_search(plain).path_cost == 835
+    assert alt.succs < plain.succs
+    cities = sorted(romania_map.locations)
+    assert problem.h_batch(cities) == [problem.h(Node(city)) for city in cities]
+    directed = Graph(dict(A=dict(B=1, C=4), B=dict(C=1, D=5), C=dict(D=1)))
+    landmarks = Landmarks(directed, k=2)
+    assert [landmarks.h_value(state, 'D') for state in 'ABCD'] == [3, 2, 1, 0]
+    assert landmarks.h_value('C', 'A') == np.inf
+    problem = GraphProblem('A', 'A', directed)
+    assert landmarks.heuristic_batch(problem, list('ABCD')) == [landmarks.h_value(s, 'A') for s in 'ABCD']
+    problem = GraphProblem('A', 'D', directed)
+    landmarks.attach(problem)
+    assert astar_search(problem).solution() == ['B', 'C', 'D']
+
+
+def test_contraction_hierarchy(tmpdir):
+    hierarchy = ContractionHierarchy(romania_map)
+    node = hierarchy.search(romania_problem)
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest'] and node.path_cost == 418
+    for goal in ['Neamt', 'Eforie', 'Timisoara', 'Arad']:
+        problem = GraphProblem('Oradea', goal, romania_map)
+        assert hierarchy.search(problem).path_cost == uniform_cost_search(problem).path_cost
+    path = str(tmpdir.join('romania.ch'))
+    hierarchy.save(path)
+    assert ContractionHierarchy.load(path).query('Arad', 'Bucharest').solution() == node.solution()
+    directed = ContractionHierarchy(Graph(dict(A=dict(B=1, C=4), B=dict(C=1, D=5), C=dict(D=1))))
+    assert directed.query('A', 'D').solution() == ['B', 'C', 'D'] and directed.query('D', 'A') is None
+
+
+def test_heuristic_cache():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    cache = HeuristicCache().attach(problem)
+    assert astar_search(problem).path_cost == 418
+    assert (len(cache), cache.hits, cache.misses) == (10, 2, 10)
+    assert recursive_best_first_search(problem).path_cost == 418
+    assert cache.misses == 10 and cache.get(('Arad', 'Bucharest')) == 350
+    problem.goal = 'Neamt'
+    astar_search(problem)
+    assert cache.get(('Arad', 'Neamt')) == 318
+    cache.detach(problem)
+    assert 'h' not in vars(problem) and problem.h(Node('Arad')) == 318
+    zero = problem.h = lambda node: 0
+    landmarks = Landmarks(romania_map, k=2).attach(problem)
+    HeuristicCache().attach(problem).detach(problem)
+    assert problem.h.source is landmarks and problem.h_batch.source is landmarks
+    problem.h = zero
+    HeuristicCache().attach(problem).detach(problem)
+    assert problem.h is zero and 'heuristic_cache' not in vars(problem)
+    puzzle = EightPuzzle((2, 4, 3, 1, 5, 6, 7, 8, 0))
+    small = HeuristicCache(maxsize=3).attach(puzzle)
+    assert astar_search(puzzle).path_cost == 8
+    assert len(small) == 3 and small.evictions == small.misses - 3
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    HeuristicCache().attach(problem)
+    astar_search(problem)
+    copied = pickle.loads(pickle.dumps(problem))
+    assert isinstance(copied.h, BoundHeuristic) and len(copied.heuristic_cache) == 10
+    assert copied.h.problem is copied and astar_search(copied).path_cost == 418
+
+
+def test_weighted_astar_search():
+    assert astar_search(romania_problem, weight=3).path_cost == 450
+    puzzle = SlidingTilePuzzle((5, 1, 3, 4, 2, 0, 7, 8, 9, 6, 10, 11, 13, 14, 15, 12))
+    optimal = astar_search(puzzle).path_cost
+    assert optimal <= astar_search(puzzle, weight=2).path_cost <= 2 * optimal
+
+
+def test_bounded_best_first_graph_search():
+    frontier = BoundedPriorityFrontier(lambda node: node.state, 2, [Node(3), Node(1), Node(2)])
+    assert len(frontier) == 2 and frontier.evicted == 1 and Node(3) not in frontier
+    frontier.append(Node(5))
+    assert frontier.evicted == 2 and [frontier.pop().state, frontier.pop().state] == [1, 2]
+    with pytest.raises(ValueError):
+        BoundedPriorityFrontier(lambda node: node.state, 0)
+    h = memoize(romania_problem.h, 'h')
+    stats = {}
+    node = bounded_best_first_graph_search(romania_problem, lambda n: n.path_cost + h(n), 2, stats=stats)
+    assert node.path_cost == 418 and stats['evicted'] == 4
+    node = bounded_best_first_graph_search(romania_problem, lambda n: n.path_cost + h(n), 1, stats=stats)
+    assert node.path_cost == 450 and stats['evicted'] == 4
+
+
+def test_beam_search():
+    stats = {}
+    assert beam_search(romania_problem, 1, stats=stats).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    assert stats['evicted'] == 4
+    assert beam_search(eight_puzzle, 10).path_cost >= astar_search(eight_puzzle).path_cost
+    dead_end = GraphProblem('A', 'G', UndirectedGraph(dict(A=dict(B=1, C=5), C=dict(G=1))))
+    assert beam_search(dead_end, 1, h=lambda node: 0) is None
+    assert beam_search(dead_end, 2, h=lambda node: 0).solution() == ['C', 'G']
+
+
+def test_anytime_repairing_astar():
+    solutions = [(node.path_cost, bound) for node, bound in anytime_repairing_astar(romania_problem, weight=5, step=1)]
+    assert solutions[0][0] == 450 and 1 < solutions[0][1] <= 5
+    assert solutions[-1] == (418, 1)
+    reported = []
+    node = anytime_astar_search(romania_problem, weight=2, callback=lambda node, bound: reported.append(bound))
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert reported[-1] == 1 and reported == sorted(reported, reverse=True)
+    assert not anytime_astar_search(romania_problem, budget=SearchBudget(max_expansions=1))
+
+
+def test_node_arena():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    arena = NodeArena().attach(problem)
+    node = astar_search(problem)
+    assert isinstance(node, ArenaNode)
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert [n.state for n in node.path()] == ['Arad', 'Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert node.path_cost == node.path()[-1].path_cost == 418
+    assert node.parent.state == 'Pitesti' and node.depth == 4
+    assert len(arena) > 0 and arena.bytes_per_node() == 32
+    assert breadth_first_graph_search(problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    assert type(node.path_cost) is int and type(node.path()[-1].path_cost) is int
+    assert arena.costs.typecode == 'q'
+    arena.add('Arad', -1, None, 0.5, 0)
+    assert arena.costs.typecode == 'd' and node.path_cost == 418.0
+    SearchEvents().attach(problem)
+    with pytest.raises(ValueError):
+        astar_search(problem)
+
+
+def test_search_budget():
+    budget = SearchBudget(max_expansions=20)
+    result = breadth_first_tree_search(eight_puzzle, budget=budget)
+    assert not result and result.reason == 'expansions'
+    assert result.expansions == 20 and isinstance(result.node, Node)
+    for searcher in [depth_first_graph_search, astar_search, iterative_deepening_search,
+                     bidirectional_search, recursive_best_first_search, iterative_deepening_astar_search]:
+        assert searcher(eight_puzzle, budget=SearchBudget(max_expansions=5)).reason == 'expansions'
+
+    assert breadth_first_tree_search(eight_puzzle, budget=SearchBudget(max_frontier=10)).reason == 'frontier'
+    assert breadth_first_tree_search(eight_puzzle, budget=SearchBudget(time_limit=0)).reason == 'time'
+    budget = SearchBudget()
+    budget.cancel()
+    assert astar_search(eight_puzzle, budget=budget).reason == 'cancelled'
+
+    budget = SearchBudget(max_expansions=1000)
+    assert astar_search(romania_problem, budget=budget).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert budget.expansions == 5 and budget.peak_frontier > 0
+
+    assert and_or_graph_search(vacuum_world, SearchBudget(max_expansions=1)).reason == 'expansions'
+    assert and_or_graph_search(vacuum_world, SearchBudget(max_expansions=1000))
+    dstar = DStarLite(GraphProblem('Arad', 'Bucharest', romania_map))
+    assert dstar.search(SearchBudget(max_expansions=2)).reason == 'expansions'
+    assert dstar.expansions == 2 and dstar.search().path_cost == 418
+    assert dstar_lite_search(romania_problem, budget=SearchBudget(time_limit=0)).reason == 'time'
+
+
+def test_graph_problem_h_batch():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    cities = ['Arad', 'Sibiu', 'Bucharest']
+    assert problem.h_batch(cities) == [problem.h(Node(city)) for city in cities]
+    problem.goal = 'Neamt'
+    assert problem.h_batch(['Neamt', 'Iasi']) == [0, problem.h(Node('Iasi'))]
+    assert astar_search(GraphProblem('Oradea', 'Neamt', romania_map), batch=True).path_cost == 835
+    assert location_table(romania_map) is location_table(romania_map)
+
+
+def test_astar_search_overridden_h():
+    class FlatProblem(GraphProblem):
+        def h(self, node):
+            return 0
+
+    flat = InstrumentedProblem(FlatProblem('Arad', 'Bucharest', romania_map))
+    assert batch_heuristic(flat) is None
+    assert astar_search(flat, batch=True).path_cost == 418 and flat.succs == 12
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    problem.h = lambda node: 0
+    instrumented = InstrumentedProblem(problem)
+    assert astar_search(instrumented, batch=True).path_cost == 418 and instrumented.succs == 12
+    straight = InstrumentedProblem(GraphProblem('Arad', 'Bucharest', romania_map))
+    assert batch_heuristic(straight) is not None
+    assert astar_search(straight, batch=True).path_cost == 418 and straight.succs == 5
+
+
 def test_find_blank_square():
     assert eight_puzzle.find_blank_square((0, 1, 2, 3, 4, 5, 6, 7, 8)) == 0
     assert eight_puzzle.find_blank_square((6, 3, 5, 1, 8, 4, 2, 0, 7)) == 7
@@ -142,6 +487,42 @@ def test_check_solvability():
     assert not eight_puzzle.check_solvability((7, 0, 2, 8, 5, 3, 6, 4, 1))
 
 
+def test_packed_eight_puzzle():
+    puzzle = PackedEightPuzzle((1, 2, 3, 4, 5, 7, 8, 6, 0))
+    assert PackedEightPuzzle.unpack(puzzle.initial) == (1, 2, 3, 4, 5, 7, 8, 6, 0)
+    assert puzzle.find_blank_square(puzzle.initial) == 8
+    assert puzzle.actions(puzzle.initial) == ('UP', 'LEFT')
+    assert PackedEightPuzzle.unpack(puzzle.result(puzzle.initial, 'UP')) == (1, 2, 3, 4, 5, 0, 8, 6, 7)
+    assert puzzle.check_solvability(puzzle.initial)
+    assert not puzzle.check_solvability((1, 2, 3, 4, 5, 6, 8, 7, 0))
+    assert puzzle.h(Node(puzzle.initial)) == 3
+    assert astar_search(puzzle).solution() == astar_search(eight_puzzle).solution()
+    assert breadth_first_graph_search(puzzle).path_cost == 12
+
+
+def test_sliding_tile_puzzle():
+    fifteen = SlidingTilePuzzle((1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 0, 15))
+    assert fifteen.n == 4
+    assert fifteen.actions(fifteen.initial) == ['UP', 'LEFT', 'RIGHT']
+    assert fifteen.check_solvability(fifteen.initial)
+    assert not fifteen.check_solvability((2, 1, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 0, 15))
+    assert astar_search(fifteen).solution() == ['RIGHT']
+    puzzle = SlidingTilePuzzle((2, 4, 3, 1, 5, 6, 7, 8, 0))
+    assert puzzle.misplaced_tiles(Node(puzzle.initial)) == 3
+    assert puzzle.manhattan(Node(puzzle.initial)) == 4
+
+
+def test_pattern_database(tmpdir):
+    pdb = AdditivePatternDatabase(3, directory=str(tmpdir))
+    assert len(tmpdir.listdir()) == 2
+    loaded = AdditivePatternDatabase(3, directory=str(tmpdir))
+    assert isinstance(loaded.databases[0].table, np.memmap)
+    puzzle = SlidingTilePuzzle((2, 4, 3, 1, 5, 6, 7, 8, 0))
+    assert pdb(Node(puzzle.goal)) == 0
+    assert puzzle.manhattan(Node(puzzle.initial)) <= loaded(Node(puzzle.initial)) <= 8
+    assert astar_search(puzzle, h=loaded).path_cost == astar_search(puzzle).path_cost == 8
+
+
 def test_conflict():
     assert not n_queens.conflict(7, 0, 1, 1)
     assert not n_queens.conflict(0, 3, 6, 4)
@@ -182,6 +563,22 @@ def test_recursive_best_first_search():
                'LEFT', 'UP', 'UP', 'LEFT', 'DOWN', 'RIGHT', 'DOWN', 'UP', 'DOWN', 'RIGHT']
 
 
+def test_iterative_deepening_astar_search():
+    assert iterative_deepening_astar_search(
+        romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert iterative_deepening_astar_search(eight_puzzle).path_cost == 12
+    assert iterative_deepening_astar_search(GraphProblem('Arad', 'Arad', romania_map)).solution() == []
+
+
+def test_simplified_memory_bounded_astar_search():
+    assert simplified_memory_bounded_astar_search(
+        romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert simplified_memory_bounded_astar_search(romania_problem, max_nodes=5).path_cost == 418
+    assert simplified_memory_bounded_astar_search(eight_puzzle, max_nodes=50).path_cost == 12
+    # The optimal path is 4 nodes deep, so it cannot fit in 4 nodes of memory.
+    assert simplified_memory_bounded_astar_search(romania_problem, max_nodes=4).path_cost == 450
+
+
 def test_hill_climbing():
     prob = PeakFindingProblem((0, 0), [[0, 5, 10, 20],
                                        [-3, 7, 11, 5]])
@@ -361,6 +758,45 @@ def test_simpleProblemSolvingAgent():
     assert a(state3) == "Right"
 
 
+def test_benchmark_searchers(tmpdir):
+    path = str(tmpdir.join('results.csv'))
+    rows = benchmark_searchers([romania_problem, GraphProblem('Q', 'WA', australia_map)],
+                               [astar_search, depth_first_tree_search], timeout=1, path=path)
+    assert [(row['searcher'], row['status'], row['cost']) for row in rows] == [
+        ('astar_search', 'solved', 418), ('astar_search', 'solved', 2),
+        ('depth_first_tree_search', 'timeout', None), ('depth_first_tree_search', 'timeout', None)]
+    assert rows[0]['expansions'] == 5 and rows[0]['cpu'] <= rows[0]['wall'] + 0.1
+    assert len(tmpdir.join('results.csv').readlines()) == 5
+
+
+def test_portfolio_search():
+    winner, node = portfolio_search(romania_problem, [depth_first_graph_search, astar_search], cost_bound=418)
+    assert winner == 'astar_search'
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert portfolio_search(romania_problem, [depth_first_graph_search], cost_bound=418) == (None, None)
+    assert portfolio_search(romania_problem, [depth_first_tree_search], timeout=0.5) == (None, None)
+
+
+def test_hash_distributed_astar_search():
+    stats = {}
+    node = hash_distributed_astar_search(romania_problem, processes=3, stats=stats)
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert node.path_cost == 418 and len(stats['expansions']) == 3
+    puzzle = EightPuzzle((2, 4, 3, 1, 5, 6, 7, 8, 0))
+    assert hash_distributed_astar_search(puzzle, processes=2).path_cost == astar_search(puzzle).path_cost
+    assert hash_distributed_astar_search(GraphProblem('Arad', 'Arad', romania_map), processes=2).path_cost == 0
+    unreachable = GraphProblem('Arad', 'Bucharest', UndirectedGraph(dict(Arad=dict(Sibiu=140))))
+    unreachable.h = lambda node: 0
+    assert hash_distributed_astar_search(unreachable, processes=2) is None
+    budget = SearchBudget()
+    assert hash_distributed_astar_search(puzzle, processes=2, budget=budget).path_cost == 8
+    assert budget.expansions > 0
+    hard = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    result = hash_distributed_astar_search(hard, processes=2, batch_size=8,
+                                           budget=SearchBudget(max_expansions=50))
+    assert result.reason == 'expansions' and result.expansions >= 50
+
+
 # TODO: for .ipynb:
 """
 >>> compare_graph_searchers()
@@ -85,6 +85,14 @@ def test_power_set():
     assert power_set([1, 2, 3]) == [(1,), (2,), (3,), (1, 2), (1, 3), (2, 3), (1, 2, 3)]
 
 
+def test_permutation_parity():
+    assert permutation_parity([]) == 0
+    assert permutation_parity([1, 2, 3]) == 0
+    assert permutation_parity([2, 1, 3]) == 1
+    assert permutation_parity([2, 3, 1]) == 0
+    assert permutation_parity('dcba') == 0
+
+
 def test_histogram():
     assert histogram([1, 2, 4, 2, 4, 5, 7, 9, 2, 1]) == [(1, 2), (2, 3), (4, 2), (5, 1), (7, 1), (9, 1)]
     assert histogram([1, 2, 4, 2, 4, 5, 7, 9, 2, 1], 0, lambda x: x * x) == \
@@ -299,5 +307,34 @@ def test_priority_queue_with_objects():
     assert len(queue) == 0
 
 
+def test_indexed_priority_queue():
+    queue = IndexedPriorityQueue(f=lambda x: x[1])
+    queue.append((1, 100))
+    queue.append((2, 30))
+    queue.append((3, 50))
+    assert queue.pop() == (2, 30)
+    assert len(queue) == 2
+    assert queue[(3, 50)] == 50
+    assert (1, 100) in queue
+    del queue[(1, 100)]
+    assert (1, 100) not in queue
+    queue.extend([(1, 100), (4, 10)])
+    assert queue.pop() == (4, 10)
+    assert len(queue) == 2
+
+
+def test_indexed_priority_queue_decrease_key():
+    priorities = {'a': 5, 'b': 3, 'c': 8, 'd': 1}
+    queue = IndexedPriorityQueue(f=lambda x: priorities[x])
+    queue.extend('abcd')
+    priorities['c'] = 0
+    queue.decrease_key('c')
+    assert queue['c'] == 0
+    del queue['d']
+    assert [queue.pop() for _ in range(len(queue))] == ['c', 'b', 'a']
+    with pytest.raises(KeyError):
+        del queue['a']
+
+
 if __name__ == '__main__':
     pytest.main()
@@ -99,6 +99,24 @@ def flatten(seqs):
     return sum(seqs, [])
 
 
+def permutation_parity(seq):
+    """Return 0 if seq, a permutation of distinct sortable items, is an even
+    permutation of sorted(seq) and 1 if it is odd; O(n log n), by cycle counting.
+    >>> permutation_parity([2, 1, 3])
+    1
+    """
+    position = {x: i for i, x in enumerate(sorted(seq))}
+    seen = [False] * len(seq)
+    cycles = 0
+    for i in range(len(seq)):
+        if not seen[i]:
+            cycles += 1
+            while not seen[i]:
+                seen[i] = True
+                i = position[seq[i]]
+    return (len(seq) - cycles) % 2
+
+
 # ______________________________________________________________________________
 # argmin and argmax
 
@@ -716,7 +734,7 @@ class hashabledict(dict):
 # ______________________________________________________________________________
 # Queues: Stack, FIFOQueue, PriorityQueue
 # Stack and FIFOQueue are implemented as list and collection.deque
-# PriorityQueue is implemented here
+# PriorityQueue and IndexedPriorityQueue are implemented here
 
 
 class PriorityQueue:
@@ -752,6 +770,13 @@ class PriorityQueue:
         else:
             raise Exception('Trying to pop from empty PriorityQueue.')
 
+    def peek(self):
+        """Return the item that pop would return, without removing it."""
+        if self.heap:
+            return self.heap[0][1]
+        else:
+            raise Exception('Trying to peek into empty PriorityQueue.')
+
     def __len__(self):
         """Return current capacity of PriorityQueue."""
         return len(self.heap)
@@ -776,6 +801,113 @@ class PriorityQueue:
             raise KeyError(str(key) + " is not in the priority queue")
         heapq.heapify(self.heap)
 
+    def decrease_key(self, item):
+        """Replace the entry equal to item by item itself, re-scored with f."""
+        del self[item]
+        self.append(item)
+
+
+class IndexedPriorityQueue(PriorityQueue):
+    """A PriorityQueue backed by a binary heap with a position map, so that
+    membership and priority lookup are O(1) and delete and decrease_key
+    are O(log n). Items must be hashable, and items that compare equal are
+    treated as the same entry (so a search Node is indexed by its state).
+    The heap holds (f(item), item) pairs, ordered exactly as in PriorityQueue."""
+
+    def __init__(self, order='min', f=lambda x: x):
+        super().__init__(order, f)
+        self.index = {}
+
+    def append(self, item):
+        """Insert item at its correct position."""
+        heap = self.heap
+        heap.append((self.f(item), item))
+        self.index[item] = len(heap) - 1
+        self._sift_up(len(heap) - 1)
+
+    def pop(self):
+        """Pop and return the item (with min or max f(x) value)
+        depending on the order."""
+        if not self.heap:
+            raise Exception('Trying to pop from empty PriorityQueue.')
+        item = self.heap[0][1]
+        self._remove_at(0)
+        return item
+
+    def __contains__(self, key):
+        """Return True if the key is in PriorityQueue."""
+        return key in self.index
+
+    def __getitem__(self, key):
+        """Returns the value associated with key in PriorityQueue.
+        Raises KeyError if key is not present."""
+        try:
+            return self.heap[self.index[key]][0]
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+
+    def __delitem__(self, key):
+        """Delete the entry for key."""
+        try:
+            i = self.index[key]
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+        self._remove_at(i)
+
+    def decrease_key(self, item):
+        """Replace the entry equal to item by item itself, re-scored with f,
+        and restore the heap order in O(log n)."""
+        try:
+            i = self.index.pop(item)
+        except KeyError:
+            raise KeyError(str(item) + " is not in the priority queue")
+        self.heap[i] = (self.f(item), item)
+        self.index[item] = i
+        self._sift_up(i)
+        self._sift_down(self.index[item])
+
+    def _remove_at(self, i):
+        """Remove the heap entry at position i."""
+        heap = self.heap
+        del self.index[heap[i][1]]
+        last = heap.pop()
+        if i < len(heap):
+            heap[i] = last
+            self.index[last[1]] = i
+            self._sift_down(i)
+            self._sift_up(i)
+
+    def _sift_up(self, i):
+        heap, index = self.heap, self.index
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[i] = heap[parent]
+            index[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        index[entry[1]] = i
+
+    def _sift_down(self, i):
+        heap, index = self.heap, self.index
+        n = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[i] = heap[child]
+            index[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        index[entry[1]] = i
+
 
 # ______________________________________________________________________________
 # Useful Shorthands